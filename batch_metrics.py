@@ -0,0 +1,145 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import traceback
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+import writing_metrics as wm
+
+# Process many word count files (e.g. one per writer) in parallel
+# Each file can have its own column configuration, given either in a "<file>.json" next to it
+# or under the file's name in a shared config file, with the keys
+#   {"project_columns":[...], "subgoal_columns":{...}, "essential_columns":{...}, "date_format":"..."}
+# Anything left out is taken from the writing_metrics defaults, and the project/subgoal columns are inferred from the file
+# e.g. python -m batch_metrics logs/ "archive/*.xlsx" --config configs.json --output metrics.csv
+
+SERIES = ["written", "net", "cumulative", "net_cumulative"]
+
+# Expand directories and glob patterns into the word count files they contain
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            matches = glob.glob(os.path.join(path, "*.csv")) + glob.glob(os.path.join(path, "*.xlsx"))
+        else:
+            matches = glob.glob(path)
+        files += [ match for match in sorted(matches) if match[-4:] == ".csv" or match[-5:] == ".xlsx" ]
+
+    # Drop duplicates while keeping the order
+    return list(dict.fromkeys(files))
+
+def file_config(word_count_file, configs=None):
+    config = {}
+    if not configs is None:
+        config.update( configs.get(os.path.basename(word_count_file), configs.get(word_count_file, {})) )
+
+    sidecar = word_count_file + ".json"
+    if os.path.exists(sidecar):
+        with open(sidecar) as f:
+            config.update(json.load(f))
+
+    return config
+
+# Flatten the output of all_non_cumulative_metrics (and optionally rolling_metrics) into one long table
+def metrics_table(standard_metrics, net_metrics, standard_weekday_metrics, net_weekday_metrics, rolling_metrics=None):
+    groups = [ ("standard", "All", standard_metrics), ("net", "All", net_metrics) ]
+    groups += [ ("standard", day, standard_weekday_metrics[day]) for day in standard_weekday_metrics ]
+    groups += [ ("net", day, net_weekday_metrics[day]) for day in net_weekday_metrics ]
+    if not rolling_metrics is None:
+        groups.append( ("rolling", "All", rolling_metrics) )
+
+    rows = []
+    for series, weekday, metrics in groups:
+        if metrics is None:
+            continue
+        for metric in metrics:
+            for project, value in metrics[metric].items():
+                rows.append( (series, weekday, metric, project, value) )
+
+    return pd.DataFrame(rows, columns=["Series", "Weekday", "Metric", "Project", "Value"])
+
+# Compute everything for one file (this runs in a worker process)
+# The series are only sent back when asked for, since they are the bulk of the result
+def process_file(word_count_file, config=None, use_cache=True, with_series=False):
+    config = {} if config is None else config
+    try:
+        essential_columns = config.get("essential_columns", wm.essential_columns)
+        date_format = config.get("date_format", wm.date_format)
+        df = wm.read_word_count_file(word_count_file, date_format, use_cache=use_cache)
+
+        project_columns, subgoal_columns = wm.infer_columns(df, essential_columns)
+        project_columns = config.get("project_columns", project_columns)
+        subgoal_columns = config.get("subgoal_columns", subgoal_columns)
+        columns = (project_columns, essential_columns, subgoal_columns)
+
+        # The series and the metrics all come from one diff, shared through a cache for this file
+        cache = wm.call_cache()
+        series = { name:wm.derived_series(name, df, *columns, cache=cache) for name in SERIES } if with_series else None
+        metrics = metrics_table( *wm.all_non_cumulative_metrics(df, *columns, date_format, cache=cache), wm.rolling_metrics(df, *columns, cache=cache) )
+    except Exception as e:
+        return {"file":word_count_file, "error":f"{type(e).__name__}: {e}", "traceback":traceback.format_exc()}
+
+    return {"file":word_count_file, "series":series, "metrics":metrics}
+
+# Process every file on a process pool, merging the results into combined tables
+# Returns the combined metrics, the combined series (keyed by series name, empty unless with_series), and the failures as a file -> error dict
+def process_files(files, configs=None, workers=None, use_cache=True, with_series=False):
+    results = []
+    if workers == 1:
+        results = [ process_file(file, file_config(file, configs), use_cache, with_series) for file in files ]
+    elif len(files) > 0:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [ executor.submit(process_file, file, file_config(file, configs), use_cache, with_series) for file in files ]
+            for file, future in zip(files, futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # The worker itself died (e.g. ran out of memory), so report it like any other failure
+                    results.append({"file":file, "error":f"{type(e).__name__}: {e}"})
+
+    failures = { result["file"]:result["error"] for result in results if "error" in result }
+    succeeded = [ result for result in results if not "error" in result ]
+
+    metrics = pd.concat([ result["metrics"].assign(File=result["file"]) for result in succeeded ], ignore_index=True) if len(succeeded) > 0 else pd.DataFrame(columns=["Series", "Weekday", "Metric", "Project", "Value", "File"])
+    metrics = metrics[ ["File"] + [ col for col in metrics.columns if not col == "File" ] ]
+    series = {}
+    for name in SERIES if with_series else []:
+        frames = { result["file"]:result["series"][name] for result in succeeded }
+        series[name] = pd.concat(frames, names=["File"]) if len(frames) > 0 else pd.DataFrame()
+
+    return metrics, series, failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m batch_metrics", description="Compute writing metrics for many word count files in parallel")
+    parser.add_argument("paths", nargs="+", help="Word count files, directories, or glob patterns")
+    parser.add_argument("--config", default=None, help="JSON file of column configurations keyed by file name")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--output", default="metrics.csv", help="Where to write the combined metrics table")
+    parser.add_argument("--series-output", default=None, help="Directory to write the combined series to (one CSV per series)")
+    parser.add_argument("--no-cache", action="store_true", help="Always read the word count files instead of their caches")
+    args = parser.parse_args(argv)
+
+    configs = None
+    if not args.config is None:
+        with open(args.config) as f:
+            configs = json.load(f)
+
+    files = collect_files(args.paths)
+    metrics, series, failures = process_files(files, configs, args.workers, use_cache=not args.no_cache, with_series=not args.series_output is None)
+
+    metrics.to_csv(args.output, index=False)
+    if not args.series_output is None:
+        os.makedirs(args.series_output, exist_ok=True)
+        for name in series:
+            series[name].to_csv(os.path.join(args.series_output, f"{name}.csv"))
+
+    print(f"Processed {len(files) - len(failures)} of {len(files)} files")
+    for file in failures:
+        print(f"Failed {file}: {failures[file]}", file=sys.stderr)
+    if len(failures) > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
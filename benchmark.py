@@ -0,0 +1,162 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import writing_metrics as wm
+from synthetic_logs import generate_log, write_log
+
+# Benchmark suite for writing_metrics on synthetic word count logs
+# Times each stage, records its peak (traced) memory, and compares against a saved baseline
+# e.g. python -m benchmark --days 3650 --projects 200 --save-baseline baseline.json
+#      python -m benchmark --days 3650 --projects 200 --baseline baseline.json
+
+# Each benchmark takes the context built by setup() and runs one stage of the pipeline
+def benchmarks(include_plots=True):
+    cases = {
+        "read_word_count_file (no cache)": lambda c: wm.read_word_count_file(c["file"], c["date_format"], use_cache=False),
+        "read_word_count_file (cached)": lambda c: wm.read_word_count_file(c["file"], c["date_format"]),
+        "words_written": lambda c: wm.words_written(c["df"], *c["columns"]),
+        "net_cumulative_words_written": lambda c: wm.net_cumulative_words_written(c["df"], *c["columns"]),
+        "non_cumulative_metrics": lambda c: wm.non_cumulative_metrics(c["df"], *c["columns"]),
+        "all_non_cumulative_metrics": lambda c: wm.all_non_cumulative_metrics(c["df"], *c["columns"], c["date_format"]),
+        "weekday_words_written": lambda c: wm.weekday_words_written(c["written"], c["columns"][0]),
+    }
+    if include_plots:
+        cases.update({
+            "plot_weekday_words_written": lambda c: plot(wm.plot_weekday_words_written, c["weekday"]),
+            "plot_progress": lambda c: plot(wm.plot_progress, c["cumulative"]),
+            "histogram_words_written": lambda c: plot(wm.histogram_words_written, c["written"], c["columns"][0]),
+        })
+    return cases
+
+# Run a plotting function without showing anything, then close its figures
+def plot(function, *args, **kwargs):
+    import matplotlib.pyplot as plt
+    function(*args, show=False, **kwargs)
+    plt.close("all")
+
+def setup(directory, days, projects, subgoals, skip_rate, file_type, date_format="%m/%d/%y", seed=0):
+    df, project_columns, essential_columns, subgoal_columns = generate_log(days, projects, subgoals, skip_rate, date_format=date_format, seed=seed)
+    file_name = os.path.join(directory, f"benchmark_log.{file_type}")
+    write_log(df, file_name)
+
+    context = {"file":file_name, "date_format":date_format, "columns":(project_columns, essential_columns, subgoal_columns)}
+    context["df"] = wm.read_word_count_file(file_name, date_format)
+    context["written"] = wm.words_written(context["df"], *context["columns"])
+    context["cumulative"] = wm.cumulative_words_written(context["df"], *context["columns"])
+    context["weekday"] = wm.weekday_words_written(context["written"], project_columns)
+    return context
+
+# Best wall time over the repeats, then the peak memory allocated during one more (traced) run
+# The memoized series are dropped before every run, so each one times the work rather than cache hits
+def measure(function, context, repeats=3):
+    times = []
+    for _ in range(repeats):
+        wm.series_cache.invalidate()
+        start = time.perf_counter()
+        function(context)
+        times.append(time.perf_counter() - start)
+
+    wm.series_cache.invalidate()
+    tracemalloc.start()
+    function(context)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {"seconds":min(times), "peak_bytes":peak}
+
+# The synthetic log a run is measured on, which has to match for a comparison to mean anything
+def config(days=3650, projects=20, subgoals=5, skip_rate=0.2, file_type="csv"):
+    return {"days":days, "projects":projects, "subgoals":subgoals, "skip_rate":skip_rate, "file_type":file_type}
+
+# The settings that differ between two configs, as (name, value, baseline value)
+def config_differences(config, baseline_config):
+    return [ (key, config[key], baseline_config.get(key)) for key in config if config[key] != baseline_config.get(key) ]
+
+def run(days=3650, projects=20, subgoals=5, skip_rate=0.2, file_type="csv", repeats=3, include_plots=True, only=None):
+    if include_plots:
+        import matplotlib
+        matplotlib.use("Agg")
+
+    results = {"config":config(days, projects, subgoals, skip_rate, file_type), "results":{}}
+    with tempfile.TemporaryDirectory() as directory:
+        context = setup(directory, days, projects, subgoals, skip_rate, file_type)
+        for name, function in benchmarks(include_plots).items():
+            if not only is None and not any( part in name for part in only ):
+                continue
+            results["results"][name] = measure(function, context, repeats)
+
+    return results
+
+# Compare against a baseline, returning the names of the benchmarks that got slower (or used more memory) than the tolerance allows
+# Baselines measured on a different synthetic log can't be compared, so they raise a ValueError
+def compare(results, baseline, tolerance=1.25):
+    differences = config_differences(results["config"], baseline.get("config", {}))
+    if len(differences) > 0:
+        raise ValueError("Baseline was measured with different settings: " + ", ".join( f"{key} {value} (baseline {base})" for key, value, base in differences ))
+    regressions = []
+    for name, result in results["results"].items():
+        if not name in baseline["results"]:
+            continue
+        base = baseline["results"][name]
+        for key in ["seconds", "peak_bytes"]:
+            if base[key] > 0 and result[key] / base[key] > tolerance:
+                regressions.append(name)
+                break
+    return regressions
+
+def report(results, baseline=None):
+    lines = []
+    for name, result in results["results"].items():
+        line = f"{name:<36} {result['seconds']*1000:>10.2f} ms {result['peak_bytes']/2**20:>10.2f} MiB"
+        if not baseline is None and name in baseline["results"]:
+            base = baseline["results"][name]
+            time_ratio = result["seconds"] / base["seconds"] if base["seconds"] > 0 else float("nan")
+            memory_ratio = result["peak_bytes"] / base["peak_bytes"] if base["peak_bytes"] > 0 else float("nan")
+            line += f"   x{time_ratio:.2f} time   x{memory_ratio:.2f} memory"
+        lines.append(line)
+    return "\n".join(lines)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmark", description="Benchmark writing_metrics on synthetic word count logs")
+    parser.add_argument("--days", type=int, default=3650)
+    parser.add_argument("--projects", type=int, default=20)
+    parser.add_argument("--subgoals", type=int, default=5)
+    parser.add_argument("--skip-rate", type=float, default=0.2)
+    parser.add_argument("--file-type", choices=["csv", "xlsx"], default="csv")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--no-plots", action="store_true", help="Skip the plotting benchmarks")
+    parser.add_argument("--only", nargs="+", default=None, help="Only run benchmarks whose name contains one of these")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--save-baseline", default=None, help="Save these results as JSON")
+    parser.add_argument("--tolerance", type=float, default=1.25, help="Ratio to the baseline that counts as a regression")
+    args = parser.parse_args(argv)
+
+    # Check the baseline before spending the time to run anything
+    baseline = None
+    if not args.baseline is None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        differences = config_differences(config(args.days, args.projects, args.subgoals, args.skip_rate, args.file_type), baseline.get("config", {}))
+        if len(differences) > 0:
+            raise SystemExit("Baseline was measured with different settings: " + ", ".join( f"--{key.replace('_', '-')} {value} (baseline {base})" for key, value, base in differences ))
+
+    results = run(args.days, args.projects, args.subgoals, args.skip_rate, args.file_type, args.repeats, not args.no_plots, args.only)
+
+    print(report(results, baseline))
+
+    if not args.save_baseline is None:
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if not baseline is None:
+        regressions = compare(results, baseline, args.tolerance)
+        if len(regressions) > 0:
+            print(f"Regressions (over x{args.tolerance}): {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+import matplotlib
+matplotlib.use("Agg")
+
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib.pyplot as plt
+import writing_metrics as wm
+from batch_metrics import collect_files, file_config
+
+# Render every chart for every word count file to image files without a display (on the Agg backend)
+# Logs are split over a process pool, and each process reuses one figure for all of its charts
+# e.g. python -m export_charts logs/ --output charts --formats png svg --per-project
+
+CHARTS = ["weekday", "written", "net", "cumulative", "net_cumulative", "histogram"]
+
+# One figure per process, cleared between charts instead of creating a new one each time
+figure_cache = {}
+
+def get_axes(size=(10, 6), dpi=100):
+    if not "figure" in figure_cache:
+        figure_cache["figure"] = plt.figure(figsize=size, dpi=dpi)
+    figure = figure_cache["figure"]
+    figure.clf()
+    return figure, figure.add_subplot()
+
+def save_chart(draw, file_name, formats):
+    figure, ax = get_axes()
+    draw(ax)
+    figure.tight_layout()
+    written = []
+    for fmt in formats:
+        figure.savefig(f"{file_name}.{fmt}", format=fmt)
+        written.append(f"{file_name}.{fmt}")
+    return written
+
+# The series behind each chart, computed once per log
+def chart_series(df, project_columns, essential_columns, subgoal_columns):
+    cache = wm.call_cache()
+    return { name:wm.derived_series(name, df, project_columns, essential_columns, subgoal_columns, cache=cache) for name in ["written", "net", "cumulative", "net_cumulative"] }
+
+def draw_functions(series, project_columns, essential_columns, subgoal_columns, columns=None, bins=10):
+    progress = lambda name: lambda ax: wm.plot_progress(series[name], columns=columns, omit_goals=True, subgoal_columns=subgoal_columns, essential_columns=essential_columns, ax=ax, show=False)
+    weekday = wm.weekday_words_written(series["written"], project_columns if columns is None else [ col for col in columns if not col == "Total" ])
+    return {"weekday":lambda ax: wm.plot_weekday_words_written(weekday, ax=ax, show=False),
+            "written":progress("written"),
+            "net":progress("net"),
+            "cumulative":progress("cumulative"),
+            "net_cumulative":progress("net_cumulative"),
+            "histogram":lambda ax: wm.histogram_words_written(series["written"], project_columns, bins=bins, columns=columns, ax=ax, show=False)}
+
+# Export the charts of one log (this runs in a worker process)
+# Returns the files written, or the error if the log couldn't be exported
+def export_log(word_count_file, output, config=None, formats=("png",), charts=CHARTS, per_project=False, use_cache=True):
+    config = {} if config is None else config
+    try:
+        essential_columns = config.get("essential_columns", wm.essential_columns)
+        date_format = config.get("date_format", wm.date_format)
+        df = wm.read_word_count_file(word_count_file, date_format, use_cache=use_cache)
+        project_columns, subgoal_columns = wm.infer_columns(df, essential_columns)
+        project_columns = config.get("project_columns", project_columns)
+        subgoal_columns = config.get("subgoal_columns", subgoal_columns)
+
+        directory = os.path.join(output, os.path.splitext(os.path.basename(word_count_file))[0])
+        os.makedirs(directory, exist_ok=True)
+        series = chart_series(df, project_columns, essential_columns, subgoal_columns)
+
+        # All the projects together, then (optionally) each project on its own
+        groups = [ ("all", None) ]
+        if per_project:
+            groups += [ (proj, [proj]) for proj in project_columns ]
+
+        written = []
+        for group, columns in groups:
+            draw = draw_functions(series, project_columns, essential_columns, subgoal_columns, columns)
+            for chart in charts:
+                # The net charts only have the projects with a goal
+                if not columns is None and chart in ["net", "net_cumulative"] and not columns[0] in series[chart].columns:
+                    continue
+                written += save_chart(draw[chart], os.path.join(directory, f"{chart}_{group}"), formats)
+    except Exception as e:
+        return {"file":word_count_file, "error":f"{type(e).__name__}: {e}"}
+
+    return {"file":word_count_file, "written":written}
+
+def export_logs(files, output, configs=None, formats=("png",), charts=CHARTS, per_project=False, workers=None, use_cache=True):
+    if workers == 1:
+        return [ export_log(file, output, file_config(file, configs), formats, charts, per_project, use_cache) for file in files ]
+
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=matplotlib.use, initargs=("Agg",)) as executor:
+        futures = [ executor.submit(export_log, file, output, file_config(file, configs), formats, charts, per_project, use_cache) for file in files ]
+        for file, future in zip(files, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"file":file, "error":f"{type(e).__name__}: {e}"})
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m export_charts", description="Export every chart for many word count files")
+    parser.add_argument("paths", nargs="+", help="Word count files, directories, or glob patterns")
+    parser.add_argument("--output", default="charts", help="Directory to write the charts to (one subdirectory per log)")
+    parser.add_argument("--formats", nargs="+", default=["png"], choices=["png", "svg"])
+    parser.add_argument("--charts", nargs="+", default=CHARTS, choices=CHARTS)
+    parser.add_argument("--per-project", action="store_true", help="Also export each project's charts on their own")
+    parser.add_argument("--config", default=None, help="JSON file of column configurations keyed by file name")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: one per CPU)")
+    parser.add_argument("--no-cache", action="store_true", help="Always read the word count files instead of their caches")
+    args = parser.parse_args(argv)
+
+    configs = None
+    if not args.config is None:
+        with open(args.config) as f:
+            configs = json.load(f)
+
+    files = collect_files(args.paths)
+    results = export_logs(files, args.output, configs, args.formats, args.charts, args.per_project, args.workers, use_cache=not args.no_cache)
+
+    failures = [ result for result in results if "error" in result ]
+    print(f"Exported {sum( len(result['written']) for result in results if 'written' in result )} charts from {len(files) - len(failures)} of {len(files)} files")
+    for result in failures:
+        print(f"Failed {result['file']}: {result['error']}", file=sys.stderr)
+    if len(failures) > 0:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,121 @@
 import sys
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel, QTextEdit, QScrollArea
-from PyQt5.QtCore import Qt
+import threading
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget, QVBoxLayout, QLabel, QTextEdit, QScrollArea, QProgressBar
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, QFileSystemWatcher, pyqtSignal
 import subprocess
+import writing_metrics as wm
+from watcher import WordCountWatcher
 
 test_file_loc = "/media/nvanalfen/T7/Coding/WritingMetrics/files/test.txt"
 
+# Raised inside a worker when its job has been cancelled
+class Cancelled(Exception):
+    pass
+
+class WorkerSignals(QObject):
+    progress = pyqtSignal(int, int, str)            # Job id, percent done, current stage
+    finished = pyqtSignal(int, object)              # Job id, results
+    failed = pyqtSignal(int, str)                   # Job id, error message
+    cancelled = pyqtSignal(int)                     # Job id
+
+# Loads the word count file and computes the metrics and series off the Qt main thread
+# Only the finished results are sent back (through signals, which Qt delivers on the main thread)
+# When watching, the file is loaded through a WordCountWatcher, which is sent back too so appended rows can be added later
+# by a worker given that watcher
+class MetricsWorker(QRunnable):
+    def __init__(self, job_id, word_count_file, project_columns, essential_columns, subgoal_columns, date_format, watch=False, watcher=None):
+        super().__init__()
+        self.job_id = job_id
+        self.word_count_file = word_count_file
+        self.columns = (project_columns, essential_columns, subgoal_columns)
+        self.date_format = date_format
+        self.watch = watch
+        self.watcher = watcher
+        self.signals = WorkerSignals()
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    # Report progress, stopping here if the job was cancelled (the running pandas call can't be interrupted, so this is checked between stages)
+    def stage(self, percent, message):
+        if self.cancel_event.is_set():
+            raise Cancelled()
+        self.signals.progress.emit(self.job_id, percent, message)
+
+    def run(self):
+        try:
+            results = self.compute() if self.watcher is None else self.check_watcher()
+        except Cancelled:
+            self.signals.cancelled.emit(self.job_id)
+            return
+        except Exception as e:
+            self.signals.failed.emit(self.job_id, f"{type(e).__name__}: {e}")
+            return
+        self.signals.finished.emit(self.job_id, results)
+
+    def compute(self):
+        self.stage(0, "Loading word count file")
+        watcher = None
+        if self.watch:
+            watcher = WordCountWatcher(self.word_count_file, *self.columns, self.date_format)
+            df = watcher.df
+        else:
+            df = wm.read_word_count_file(self.word_count_file, self.date_format)
+        # Every series and the metrics come from one diff, shared through a cache for this job
+        cache = wm.call_cache()
+        self.stage(25, "Computing words written")
+        results = {"watcher":watcher,
+                   "written":wm.derived_series("written", df, *self.columns, cache=cache),
+                   "net":wm.derived_series("net", df, *self.columns, cache=cache)}
+        self.stage(50, "Computing cumulative words written")
+        results["cumulative"] = wm.derived_series("cumulative", df, *self.columns, cache=cache)
+        results["net_cumulative"] = wm.derived_series("net_cumulative", df, *self.columns, cache=cache)
+        self.stage(75, "Computing metrics")
+        results["metrics"] = wm.all_non_cumulative_metrics(df, *self.columns, self.date_format, cache=cache)
+        self.stage(100, "Done")
+        return results
+
+    # Add the rows appended to the watched file since the last check, or reload it if anything before them changed
+    # The watcher keeps its series up to date itself, so only the new rows are worked on here
+    def check_watcher(self):
+        self.stage(0, "Checking for changes")
+        with self.watcher.lock:
+            update = self.watcher.check()
+            if update is None:
+                return None
+            # The watcher has moved past the rows it read, so from here on the job isn't stopped even if it was cancelled
+            self.signals.progress.emit(self.job_id, 50, "Computing metrics")
+            if update["reloaded"]:
+                metrics = wm.all_non_cumulative_metrics(self.watcher.df, *self.columns, self.date_format)
+            else:
+                metrics = self.watcher.metrics.metrics()
+            results = {"watcher":self.watcher, "update":update, "metrics":metrics,
+                       "written":self.watcher.written, "net":self.watcher.net,
+                       "cumulative":self.watcher.cumulative, "net_cumulative":self.watcher.net_cumulative}
+        self.signals.progress.emit(self.job_id, 100, "Done")
+        return results
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # Repeated requests within this many milliseconds are merged into one
+    debounce_ms = 300
+
+    def __init__(self, word_count_file=None):
         super().__init__()
+        self.word_count_file = wm.word_count_file if word_count_file is None else word_count_file
+        self.thread_pool = QThreadPool.globalInstance()
+        self.job_id = 0
+        self.worker = None
+        self.results = None
+        self.debounce_timer = QTimer(self)
+        self.debounce_timer.setSingleShot(True)
+        self.debounce_timer.timeout.connect(self.start_metrics)
+        self.watcher = None
+        self.check_worker = None
+        self.file_watcher = None
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.timeout.connect(self.check_file)
 
         self.setWindowTitle("Tab Example")
         self.setGeometry(100, 100, 800, 600)
@@ -28,11 +136,18 @@ class MainWindow(QMainWindow):
         self.label2 = QLabel("This is Tab 2")
         self.text_edit = QTextEdit()
         self.text_edit.setReadOnly(True)
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 100)
+        self.progress_label = QLabel("")
         self.layout2.addWidget(self.label2)
         self.layout2.addWidget(self.text_edit)
+        self.layout2.addWidget(self.progress_bar)
+        self.layout2.addWidget(self.progress_label)
         self.tab2.setLayout(self.layout2)
 
         self.add_text_to_tab2("Click me to run a command!", self.run_command)
+        self.add_text_to_tab2("Cancel", self.cancel_metrics)
+        self.add_text_to_tab2("Watch for changes", self.toggle_watch)
 
         self.setCentralWidget(self.tabs)
 
@@ -44,7 +159,117 @@ class MainWindow(QMainWindow):
         self.layout2.addWidget(clickable_text)
 
     def run_command(self):
-        self.text_edit.append("Running a command!")
+        self.request_metrics()
+
+    # Restart the debounce timer, so a burst of requests only computes the metrics once
+    def request_metrics(self):
+        self.debounce_timer.start(self.debounce_ms)
+
+    def start_metrics(self):
+        # Only the newest job's results are shown, so cancel whatever is still running
+        self.cancel_metrics()
+        self.worker = self.start_worker()
+        self.text_edit.append(f"Computing metrics for {self.word_count_file}")
+
+    def start_worker(self, watcher=None):
+        self.job_id += 1
+        worker = MetricsWorker(self.job_id, self.word_count_file, wm.project_columns, wm.essential_columns, wm.subgoal_columns, wm.date_format,
+                               watch=not self.file_watcher is None, watcher=watcher)
+        worker.signals.progress.connect(self.on_progress)
+        worker.signals.finished.connect(self.on_finished)
+        worker.signals.failed.connect(self.on_failed)
+        worker.signals.cancelled.connect(self.on_cancelled)
+        self.thread_pool.start(worker)
+        return worker
+
+    # Watcher checks aren't cancelled (they're quick, and the watcher has moved past any rows they read), only full computations are
+    def cancel_metrics(self):
+        self.debounce_timer.stop()
+        if not self.worker is None:
+            self.worker.cancel()
+            self.worker = None
+
+    def on_progress(self, job_id, percent, message):
+        if job_id != self.job_id:
+            return
+        self.progress_bar.setValue(percent)
+        self.progress_label.setText(message)
+
+    def finish_check(self, job_id):
+        if not self.check_worker is None and self.check_worker.job_id == job_id:
+            self.check_worker = None
+
+    def on_finished(self, job_id, results):
+        self.finish_check(job_id)
+        if job_id != self.job_id:
+            return
+        self.worker = None
+        if results is None:
+            self.progress_label.setText("No changes")
+            return
+        self.results = results
+        self.watcher = results["watcher"] if not self.file_watcher is None else None
+        update = results.get("update")
+        if not update is None and update["reloaded"]:
+            self.text_edit.append(f"{self.word_count_file} changed, recomputed metrics")
+        elif not update is None:
+            self.text_edit.append(f">>>>> New Rows\n{update['written'].to_string()}")
+        self.show_metrics(results["metrics"])
+
+    def show_metrics(self, metrics):
+        standard_metrics, net_metrics, _, _ = metrics
+        for title, metrics in [("Standard", standard_metrics), ("Net", net_metrics)]:
+            self.text_edit.append(f">>>>> {title}")
+            for key in metrics:
+                self.text_edit.append(f">>> {key}:\n{metrics[key].to_string()}")
+
+    def on_failed(self, job_id, message):
+        self.finish_check(job_id)
+        if job_id != self.job_id:
+            return
+        self.worker = None
+        self.progress_label.setText("Failed")
+        self.text_edit.append(f"Error: {message}")
+
+    def on_cancelled(self, job_id):
+        if job_id != self.job_id:
+            return
+        self.progress_label.setText("Cancelled")
+
+    # Start (or stop) watching the word count file, computing the metrics through a WordCountWatcher
+    def toggle_watch(self):
+        if not self.file_watcher is None:
+            self.file_watcher.deleteLater()
+            self.file_watcher = None
+            self.watcher = None
+            self.watch_timer.stop()
+            self.text_edit.append(f"Stopped watching {self.word_count_file}")
+            return
+
+        self.file_watcher = QFileSystemWatcher([ self.word_count_file ], self)
+        self.file_watcher.fileChanged.connect(self.on_file_changed)
+        self.text_edit.append(f"Watching {self.word_count_file}")
+        self.request_metrics()
+
+    # Editors often write several times in a row, so wait for the writes to settle before checking
+    def on_file_changed(self, path):
+        # A file that was replaced (rather than written to) is dropped from the watcher, so add it back
+        if not path in self.file_watcher.files():
+            self.file_watcher.addPath(path)
+        self.watch_timer.start(self.debounce_ms)
+
+    # The check runs in a worker like any other request, which adds appended rows to the watcher or reloads the file
+    def check_file(self):
+        if self.file_watcher is None:
+            return
+        if self.watcher is None:
+            self.request_metrics()
+            return
+        # Let a running check (or load) finish first, checking again once it has
+        if not self.worker is None or not self.check_worker is None:
+            self.watch_timer.start(self.debounce_ms)
+            return
+        self.check_worker = self.start_worker(self.watcher)
 
 class WritingProjectTabWidget(QWidget):
     def __init__(self, project_dict=None):
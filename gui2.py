@@ -1,9 +1,114 @@
 import sys
+import numpy as np
 import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
 from PyQt5.QtWidgets import QApplication, QMainWindow, QVBoxLayout, QWidget, QPushButton
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 
+# Reduce a series to at most two points (the lowest and highest, in order) per bucket of width buckets
+# Long daily series drawn on a few hundred pixels keep their shape (including spikes) with a fraction of the points
+def decimate_minmax(x, y, width):
+    x, y = np.asarray(x), np.asarray(y)
+    width = max(int(width), 1)
+    if len(y) <= 2 * width:
+        return x, y
+
+    # Equal sized buckets, with whatever is left over as one more bucket at the end
+    size = len(y) // width
+    end = size * width
+    buckets = y[:end].reshape(width, size)
+    offsets = np.arange(width) * size
+    lowest = offsets + buckets.argmin(axis=1)
+    highest = offsets + buckets.argmax(axis=1)
+    indices = np.sort(np.stack([lowest, highest], axis=1), axis=1).ravel()
+    if end < len(y):
+        rest = y[end:]
+        indices = np.concatenate([ indices, np.sort([ end + rest.argmin(), end + rest.argmax() ]) ])
+    if indices[-1] != len(y) - 1:
+        indices = np.append(indices, len(y) - 1)
+
+    return x[indices], y[indices]
+
+# Keeps one Line2D per series and updates it in place, redrawing only the lines (blitting) when the axes don't change
+# The full series are kept, and decimated to the width of the axes in pixels for the visible range whenever it changes
+class IncrementalPlot:
+    def __init__(self, ax, canvas):
+        self.ax = ax
+        self.canvas = canvas
+        self.lines = {}
+        self.data = {}
+        self.background = None
+        self.canvas.mpl_connect("draw_event", self.on_draw)
+
+    # Set (or replace) the data of one series, reusing its line if it already exists
+    def set_series(self, name, x, y, **kwargs):
+        x, y = np.asarray(x), np.asarray(y)
+        if np.issubdtype(x.dtype, np.datetime64):
+            x = mdates.date2num(x)
+        self.data[name] = (x, y)
+        if not name in self.lines:
+            self.lines[name], = self.ax.plot([], [], label=name, animated=True, **kwargs)
+        self.decimate(name)
+
+    # One series per column, with the index on the x axis (e.g. the output of cumulative_words_written)
+    def set_frame(self, values, columns=None):
+        columns = list(values.columns) if columns is None else columns
+        x = values.index.to_numpy()
+        for col in columns:
+            self.set_series(col, x, values[col].to_numpy())
+
+    def remove_series(self, name):
+        self.lines.pop(name).remove()
+        del self.data[name]
+
+    def decimate(self, name):
+        x, y = self.data[name]
+        left, right = self.ax.get_xlim()
+        if len(x) > 1 and np.all(x[1:] >= x[:-1]):
+            # Only the visible points (plus one on each side so the line reaches the edges)
+            start = max(np.searchsorted(x, left, side="left") - 1, 0)
+            stop = min(np.searchsorted(x, right, side="right") + 1, len(x))
+            x, y = x[start:stop], y[start:stop]
+        self.lines[name].set_data( *decimate_minmax(x, y, self.ax.bbox.width) )
+
+    # Whether any series falls outside the current limits (so the axes have to be redrawn)
+    def rescale(self):
+        if len(self.data) == 0:
+            return False
+        xs = np.concatenate([ x for x, _ in self.data.values() if len(x) > 0 ] or [ np.zeros(0) ])
+        ys = np.concatenate([ y for _, y in self.data.values() if len(y) > 0 ] or [ np.zeros(0) ])
+        if len(xs) == 0:
+            return False
+
+        (left, right), (bottom, top) = self.ax.get_xlim(), self.ax.get_ylim()
+        if xs.min() >= left and xs.max() <= right and ys.min() >= bottom and ys.max() <= top:
+            return False
+
+        margin = lambda low, high: 0.05 * (high - low) if high > low else 1
+        self.ax.set_xlim(xs.min() - margin(xs.min(), xs.max()), xs.max() + margin(xs.min(), xs.max()))
+        self.ax.set_ylim(ys.min() - margin(ys.min(), ys.max()), ys.max() + margin(ys.min(), ys.max()))
+        return True
+
+    # Blit the lines over the saved background, or do a full draw if the axes (or anything outside them) changed
+    def redraw(self, full=False):
+        if self.rescale() or full or self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+
+    # After every full draw (including zooming, panning, and resizing) decimate for the new view and save the background
+    def on_draw(self, event):
+        for name in self.data:
+            self.decimate(name)
+        self.background = self.canvas.copy_from_bbox(self.ax.bbox)
+        for line in self.lines.values():
+            self.ax.draw_artist(line)
+        self.canvas.blit(self.ax.bbox)
+
 class MyMainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -17,6 +122,7 @@ class MyMainWindow(QMainWindow):
         self.figure, self.ax = plt.subplots()
         self.canvas = FigureCanvas(self.figure)
         layout.addWidget(self.canvas)
+        self.plot = IncrementalPlot(self.ax, self.canvas)
 
         # Create a button to update the plot
         self.update_button = QPushButton('Update Plot', self)
@@ -32,24 +138,24 @@ class MyMainWindow(QMainWindow):
         # Example plot data
         x = [1, 2, 3, 4, 5]
         y = [3, 5, 2, 7, 4]
-        self.ax.plot(x, y)
+        self.plot.set_series('data', x, y)
         self.ax.set_xlabel('X-axis')
         self.ax.set_ylabel('Y-axis')
         self.ax.set_title('Matplotlib Plot')
 
-        self.canvas.draw()
+        self.plot.redraw(full=True)
 
     def update_plot(self):
         # Example: Update the plot when the button is clicked
         x = [1, 2, 3, 4, 5]
         new_y = [5, 4, 3, 6, 2]
-        self.ax.clear()
-        self.ax.plot(x, new_y)
-        self.ax.set_xlabel('X-axis')
-        self.ax.set_ylabel('Y-axis')
+        self.plot.set_series('data', x, new_y)
+
+        # The title is outside the axes, so changing it needs one full draw
+        full = self.ax.get_title() != 'Updated Matplotlib Plot'
         self.ax.set_title('Updated Matplotlib Plot')
 
-        self.canvas.draw()
+        self.plot.redraw(full=full)
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
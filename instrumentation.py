@@ -0,0 +1,200 @@
+import atexit
+import cProfile
+import functools
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict
+
+# Records the wall time, call counts, and (optionally) memory of each stage of writing_metrics
+# Switched on with enable() (or the --instrument flag of writing_metrics_cli), or without changing any code through the environment:
+#   WRITING_METRICS_INSTRUMENT=1                    time every stage and print a text report to stderr on exit
+#   WRITING_METRICS_INSTRUMENT=memory,profile,json  also trace memory and run cProfile, and print the report as JSON
+#   WRITING_METRICS_INSTRUMENT_REPORT=report.json   write the report to a file instead (JSON if it ends in .json, otherwise text)
+# The functions of each stage are only wrapped while it's enabled, so it costs nothing when it's off
+
+# The writing_metrics functions that make up each stage
+STAGES = OrderedDict([("load", ["read_word_count_file", "read_word_count_chunks", "read_excel_chunks"]),
+                      ("dates", ["parse_dates", "get_weekday", "get_week", "get_month", "get_year"]),
+                      ("diffs", ["words_written", "net_words_written", "cumulative_words_written", "net_cumulative_words_written", "words_written_array"]),
+                      ("metrics", ["non_cumulative_metrics", "all_non_cumulative_metrics", "summarize_metrics"]),
+                      ("plotting", ["plot_weekday_words_written", "plot_progress", "histogram_words_written"])])
+
+ENVIRONMENT_VARIABLE = "WRITING_METRICS_INSTRUMENT"
+REPORT_VARIABLE = "WRITING_METRICS_INSTRUMENT_REPORT"
+
+class Instrumentation:
+    def __init__(self):
+        self.module = None
+        self.originals = {}
+        self.memory = False
+        self.profiler = None
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.reset()
+
+    @property
+    def enabled(self):
+        return not self.module is None
+
+    def reset(self):
+        self.stages = OrderedDict( (stage, {"seconds":0.0, "calls":0, "peak_bytes":0, "net_bytes":0}) for stage in STAGES )
+        self.functions = OrderedDict()
+        self.traced_memory = False
+
+    # Wrap the stage functions of module (writing_metrics unless given), optionally tracing memory and running cProfile as well
+    # Functions inside writing_metrics call each other through the module, so calls from inside it are recorded too
+    def enable(self, memory=False, profile=False, module=None):
+        if self.enabled:
+            self.disable()
+        if module is None:
+            import writing_metrics as module
+        self.module = module
+
+        for stage, names in STAGES.items():
+            for name in names:
+                if hasattr(module, name):
+                    self.originals[name] = getattr(module, name)
+                    setattr(module, name, self.wrap(stage, name, self.originals[name]))
+
+        self.memory = memory
+        self.traced_memory = self.traced_memory or memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if profile:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    # Put the original functions back (the recorded stats are kept until reset())
+    def disable(self):
+        if not self.enabled:
+            return
+        for name, function in self.originals.items():
+            setattr(self.module, name, function)
+        self.originals = {}
+        self.module = None
+
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+        if not self.profiler is None:
+            self.profiler.disable()
+
+    def wrap(self, stage, name, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return self.call(stage, name, function, args, kwargs)
+        wrapper.original = function
+        return wrapper
+
+    # Stages are timed from their outermost call, so e.g. words_written_array inside words_written isn't counted twice
+    # Functions are timed on every call, including the time of any stages they call (e.g. the diffs inside the metrics)
+    def call(self, stage, name, function, args, kwargs):
+        depths = self.local.__dict__.setdefault("depths", {})
+        outermost = depths.get(stage, 0) == 0
+        depths[stage] = depths.get(stage, 0) + 1
+
+        memory = self.memory and tracemalloc.is_tracing()
+        if memory:
+            self.start_memory()
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            seconds = time.perf_counter() - start
+            peak, net = self.stop_memory() if memory else (0, 0)
+            depths[stage] -= 1
+
+            with self.lock:
+                record = self.functions.setdefault(name, {"stage":stage, "seconds":0.0, "calls":0, "peak_bytes":0, "net_bytes":0})
+                records = [ record, self.stages[stage] ] if outermost else [ record ]
+                for record in records:
+                    record["seconds"] += seconds
+                    record["calls"] += 1
+                    record["peak_bytes"] = max(record["peak_bytes"], peak)
+                    record["net_bytes"] += net
+
+    # tracemalloc only keeps one peak, so nested calls keep a stack of (memory at the start, highest peak seen so far)
+    # and reset the peak between them, passing their own peak up to the call around them when they finish
+    def start_memory(self):
+        stack = self.local.__dict__.setdefault("memory", [])
+        current, peak = tracemalloc.get_traced_memory()
+        if len(stack) > 0:
+            stack[-1][1] = max(stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        stack.append([current, current])
+
+    def stop_memory(self):
+        stack = self.local.memory
+        current, peak = tracemalloc.get_traced_memory()
+        start, highest = stack.pop()
+        highest = max(highest, peak)
+        if len(stack) > 0:
+            stack[-1][1] = max(stack[-1][1], highest)
+        tracemalloc.reset_peak()
+        return highest - start, current - start
+
+    def report(self, profile_lines=25):
+        with self.lock:
+            results = {"stages":json.loads(json.dumps(self.stages)), "functions":json.loads(json.dumps(self.functions)),
+                       "memory":self.traced_memory}
+        if not self.profiler is None:
+            results["profile"] = self.profile_text(profile_lines)
+        return results
+
+    def profile_text(self, lines=25):
+        stream = io.StringIO()
+        pstats.Stats(self.profiler, stream=stream).sort_stats("cumulative").print_stats(lines)
+        return stream.getvalue()
+
+    def save_profile(self, file_name):
+        self.profiler.dump_stats(file_name)
+
+    def report_text(self, profile_lines=25):
+        results = self.report(profile_lines)
+        memory = lambda record: f" {record['peak_bytes']/2**20:>10.2f} MiB peak {record['net_bytes']/2**20:>10.2f} MiB kept" if results["memory"] else ""
+        lines = [">>>>> Stages"]
+        for stage, record in results["stages"].items():
+            lines.append(f"{stage:<36} {record['seconds']*1000:>10.2f} ms {record['calls']:>8} calls" + memory(record))
+        lines.append(">>>>> Functions")
+        for name, record in results["functions"].items():
+            lines.append(f"{name:<36} {record['seconds']*1000:>10.2f} ms {record['calls']:>8} calls" + memory(record))
+        if "profile" in results:
+            lines.append(">>>>> Profile")
+            lines.append(results["profile"])
+        return "\n".join(lines)
+
+    # Write the report to a file (JSON if it ends in .json, otherwise text) or print it to stderr
+    def write_report(self, file_name=None, as_json=False):
+        as_json = as_json or ( not file_name is None and file_name.endswith(".json") )
+        text = json.dumps(self.report(), indent=4) if as_json else self.report_text()
+        if file_name is None:
+            print(text, file=sys.stderr)
+            return
+        with open(file_name, "w") as f:
+            f.write(text)
+
+instrumentation = Instrumentation()
+
+enable = instrumentation.enable
+disable = instrumentation.disable
+reset = instrumentation.reset
+report = instrumentation.report
+report_text = instrumentation.report_text
+write_report = instrumentation.write_report
+
+# Called by writing_metrics when it's imported with WRITING_METRICS_INSTRUMENT set, reporting when the program exits
+def enable_from_environment(module=None):
+    value = os.environ.get(ENVIRONMENT_VARIABLE, "")
+    if value.strip().lower() in ["", "0", "false", "no", "off"]:
+        return False
+    options = [ option.strip().lower() for option in value.split(",") ]
+
+    instrumentation.enable(memory="memory" in options, profile="profile" in options, module=module)
+    atexit.register(instrumentation.write_report, os.environ.get(REPORT_VARIABLE), "json" in options)
+    return True
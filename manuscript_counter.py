@@ -0,0 +1,262 @@
+import argparse
+import csv
+import hashlib
+import io
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import numpy as np
+import writing_metrics as wm
+
+# Count the words in each project's manuscript files and write the day's row of the word count file
+# Projects map a project column to its manuscript, the same way as gui.WritingProjectTabWidget's project_dict:
+# a file, a directory (every text file in it, e.g. one per chapter), or a list of either
+# e.g. python -m manuscript_counter projects.json --log test.csv
+#
+# Files are read in fixed size chunks into one reused buffer, and the word count and hash of every chunk is kept in a state file,
+# so a file whose size and modification time haven't changed isn't read at all, and only the chunks of a changed file
+# whose contents changed are counted again (the rest are only hashed)
+# Writing at the end of a file only changes its last chunks, though an edit near the start shifts (and recounts) everything after it
+# Manuscripts are taken to be UTF-8 (which ASCII is too), so a chunk never splits a character and Unicode spaces separate words
+
+# Extensions counted when a project's manuscript is a directory
+text_extensions = [".txt", ".md", ".markdown", ".tex", ".rst", ".fountain"]
+
+chunk_size = 2**20
+
+# Changed whenever the way chunks are counted changes, so counts kept in an older state file are counted again
+count_version = 2
+
+# A word is a run of anything but whitespace, the same as str.split sees it
+# Single byte whitespace is looked up in a table, the multibyte Unicode spaces (e.g. the non-breaking space) are matched as UTF-8
+whitespace = np.array([ chr(byte).isspace() for byte in range(256) ]) & (np.arange(256) < 128)
+unicode_spaces = [ np.frombuffer(c.encode(), dtype=np.uint8) for c in map(chr, range(128, 0x3001)) if c.isspace() ]
+
+def manuscript_files(path):
+    if isinstance(path, (list, tuple)):
+        return [ file for part in path for file in manuscript_files(part) ]
+    if os.path.isdir(path):
+        files = []
+        for directory, _, names in os.walk(path):
+            files += [ os.path.join(directory, name) for name in names if os.path.splitext(name)[1].lower() in text_extensions ]
+        return sorted(files)
+    return [ path ]
+
+# Which bytes of a chunk are whitespace, marking every byte of the multibyte spaces
+# Only the bytes that can start one are tried, which in mostly ASCII text are few
+def whitespace_mask(data):
+    codes = np.frombuffer(data, dtype=np.uint8)
+    space = whitespace[codes]
+    starts = np.flatnonzero(codes >= 0xC2)
+    if len(starts) > 0:
+        padded = np.concatenate([ codes, np.zeros(3, dtype=np.uint8) ])
+        for sequence in unicode_spaces:
+            matches = starts
+            for i, byte in enumerate(sequence):
+                matches = matches[ padded[matches + i] == byte ]
+            for i in range(len(sequence)):
+                space[matches + i] = True
+    return space
+
+# Where the last whole UTF-8 character of data[:end] ends, so a chunk can stop there instead of splitting one
+def character_end(data, end):
+    for start in range(end - 1, max(end - 4, -1), -1):
+        byte = data[start]
+        if byte < 0x80:
+            return end
+        if byte >= 0xC0:
+            length = 2 if byte < 0xE0 else 3 if byte < 0xF0 else 4
+            return start if start > 0 and start + length > end else end
+    return end
+
+# Words in a chunk of bytes (counting the starts of words), and whether it starts and ends on whitespace
+# so that a word split over two chunks is only counted once
+def count_chunk(data):
+    space = whitespace_mask(data)
+    if len(space) == 0:
+        return 0, True, True
+    words = int(np.count_nonzero(space[:-1] & ~space[1:])) + int(not space[0])
+    return words, bool(space[0]), bool(space[-1])
+
+# Total words in a file from its chunks, as [hash, words, starts on whitespace, ends on whitespace]
+def combine_chunks(chunks):
+    split = sum( 1 for previous, chunk in zip(chunks, chunks[1:]) if not previous[3] and not chunk[2] )
+    return sum( chunk[1] for chunk in chunks ) - split
+
+# Count one file, reusing what it can from its previous entry in the state
+# Returns the new entry and the number of bytes that had to be counted again
+def count_file(path, previous=None, size=chunk_size):
+    stat = os.stat(path)
+    if not previous is None and previous.get("version") != count_version:
+        previous = None
+    if not previous is None and previous["mtime_ns"] == stat.st_mtime_ns and previous["size"] == stat.st_size and previous["chunk_size"] == size:
+        return previous, 0
+
+    known = {}
+    if not previous is None and previous["chunk_size"] == size:
+        known = { chunk[0]:chunk for chunk in previous["chunks"] }
+
+    chunks = []
+    counted = 0
+    # Reading (rather than mapping) the file means one that's cut short while it's counted just ends early instead of faulting
+    # A character split by a full buffer is carried over to the start of the next chunk
+    if stat.st_size > 0:
+        buffer = bytearray(min(size, stat.st_size))
+        carried = 0
+        with open(path, "rb") as f, memoryview(buffer) as view:
+            while True:
+                read = carried + f.readinto(view[carried:])
+                if read == 0:
+                    break
+                end = character_end(view, read) if read == len(view) else read
+                with view[:end] as piece:
+                    digest = hashlib.blake2b(piece, digest_size=16).hexdigest()
+                    if not digest in known:
+                        known[digest] = [ digest, *count_chunk(piece) ]
+                        counted += end
+                    chunks.append(known[digest])
+                carried = read - end
+                view[:carried] = bytes(view[end:read])
+
+    entry = {"version":count_version, "mtime_ns":stat.st_mtime_ns, "size":stat.st_size, "chunk_size":size, "chunks":chunks, "words":combine_chunks(chunks)}
+    return entry, counted
+
+class ManuscriptCounter:
+    def __init__(self, projects, state_file=None, chunk_size=chunk_size, workers=None):
+        self.projects = projects
+        self.state_file = state_file
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.files = {}
+        self.stats = {}
+        # State that can't be read (e.g. cut short by an older, interrupted save) only means counting everything again
+        if not state_file is None and os.path.exists(state_file):
+            try:
+                with open(state_file) as f:
+                    self.files = json.load(f)
+            except (OSError, ValueError):
+                self.files = {}
+            if not isinstance(self.files, dict):
+                self.files = {}
+
+    # Word count of every project, counting its files in parallel
+    # Threads are enough here, since hashing and the numpy counting both release the GIL, and the chunks read aren't copied between processes
+    def count(self):
+        # Projects without a manuscript are left out, so their columns are carried over instead of set to 0
+        files = OrderedDict( (project, manuscript_files(path)) for project, path in self.projects.items() if not path is None )
+        paths = list(dict.fromkeys( path for project in files for path in files[project] ))
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map( lambda path: count_file(path, self.files.get(path), self.chunk_size), paths ))
+
+        self.files = { path:entry for path, (entry, _) in zip(paths, results) }
+        self.stats = {"files":len(paths),
+                      "recounted_files":sum( 1 for _, counted in results if counted > 0 ),
+                      "recounted_bytes":sum( counted for _, counted in results )}
+
+        return OrderedDict( (project, sum( self.files[path]["words"] for path in files[project] )) for project in files )
+
+    # Written to a temporary file of its own first, so an interrupted save leaves the previous state in place
+    def save(self):
+        handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.state_file)), suffix=".tmp")
+        try:
+            with os.fdopen(handle, "w") as f:
+                json.dump(self.files, f)
+            os.replace(temp_file, self.state_file)
+        except BaseException:
+            if os.path.exists(temp_file):
+                os.remove(temp_file)
+            raise
+
+# The fields of the first and last lines of a CSV word count file, reading only its end for the last line
+def log_ends(word_count_file):
+    with open(word_count_file, "rb") as f:
+        header = next(csv.reader([ f.readline().decode() ]), [])
+        end = f.seek(0, os.SEEK_END)
+        f.seek(max(end - 65536, 0))
+        lines = [ line for line in f.read().decode().splitlines() if line.strip() ]
+    last = next(csv.reader([ lines[-1] ])) if len(lines) > 0 else None
+    return header, last if last != header else None
+
+# The day's row for the word count file: the counted projects, with every other column (e.g. the goals) carried over from the last row
+def log_row(word_count_file, counts, date=None, date_format=wm.date_format):
+    date = datetime.now() if date is None else date
+    header, last = log_ends(word_count_file)
+    previous = dict(zip(header, last)) if not last is None else {}
+
+    row = OrderedDict()
+    for i, col in enumerate(header):
+        if i == 0:
+            row[col] = date.strftime(date_format)
+        elif col in counts:
+            row[col] = str(counts[col])
+        else:
+            row[col] = previous.get(col, "0")
+    return row
+
+# Append the row, or replace the last row if it's for the same day (so counting again during the day updates it)
+def write_log_row(word_count_file, row, date_format=wm.date_format):
+    wm.check_word_count_file_type(word_count_file)
+    if word_count_file[-4:] != ".csv":
+        raise ValueError(f"Rows can only be written to CSV word count files, got {word_count_file}")
+
+    header, last = log_ends(word_count_file)
+    line = io.StringIO()
+    csv.writer(line, lineterminator="\n").writerow(row.values())
+    line = line.getvalue()
+    date = datetime.strptime(next(iter(row.values())), date_format)
+    same_day = not last is None and datetime.strptime(last[0], date_format) == date
+
+    with open(word_count_file, "rb+") as f:
+        data_end = f.seek(0, os.SEEK_END)
+        f.seek(max(data_end - 65536, 0))
+        tail = f.read()
+        if same_day:
+            # Cut the file back to the start of the last row
+            stripped = tail.rstrip(b"\r\n")
+            f.truncate(data_end - len(tail) + stripped.rfind(b"\n") + 1)
+        elif not tail.endswith(b"\n"):
+            line = "\n" + line
+        f.seek(0, os.SEEK_END)
+        f.write(line.encode())
+
+    return "replaced" if same_day else "appended"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m manuscript_counter", description="Count the words in each project's manuscript and write the day's row of the word count file",
+                                     epilog="Manuscripts are read as UTF-8, and words are separated by ASCII and Unicode whitespace (e.g. non-breaking spaces)")
+    parser.add_argument("projects", help="JSON file mapping each project column to its manuscript file(s) or directory")
+    parser.add_argument("--log", default=wm.word_count_file, help="CSV word count file to write the row to")
+    parser.add_argument("--date", default=None, help="Date of the row (in --date-format, default today)")
+    parser.add_argument("--date-format", default=wm.date_format, help="Format of the dates in the word count file")
+    parser.add_argument("--state", default=None, help="File keeping the chunk counts between runs (default: the projects file + .state)")
+    parser.add_argument("--chunk-size", type=int, default=chunk_size, help="Bytes per chunk of a manuscript file")
+    parser.add_argument("--workers", type=int, default=None, help="Number of threads counting files")
+    parser.add_argument("--dry-run", action="store_true", help="Print the row instead of writing it")
+    args = parser.parse_args(argv)
+
+    with open(args.projects) as f:
+        projects = json.load(f)
+
+    counter = ManuscriptCounter(projects, args.projects + ".state" if args.state is None else args.state, args.chunk_size, args.workers)
+    try:
+        counts = counter.count()
+    except OSError as e:
+        raise SystemExit(str(e))
+    counter.save()
+
+    date = None if args.date is None else datetime.strptime(args.date, args.date_format)
+    try:
+        row = log_row(args.log, counts, date, args.date_format)
+        action = "Dry run" if args.dry_run else write_log_row(args.log, row, args.date_format).title()
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    print(f"{action}: {','.join(row.values())}")
+    print(f"Counted {counter.stats['recounted_bytes']} bytes in {counter.stats['recounted_files']} of {counter.stats['files']} files")
+
+if __name__ == "__main__":
+    main()
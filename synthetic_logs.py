@@ -0,0 +1,58 @@
+import argparse
+import numpy as np
+import pandas as pd
+
+# Generate synthetic word count logs in the same layout as the real word count file
+# (a date index, the overall goal, subgoal columns, then the cumulative word count of each project)
+# Used for benchmarking on logs much larger than test.csv
+
+# Returns the log and the column configuration to use with writing_metrics
+def generate_log(days=365, projects=3, subgoals=1, skip_rate=0.2, goal=1500, subgoal=500, start="2000-01-01", date_format="%m/%d/%y", seed=0):
+    rng = np.random.default_rng(seed)
+    subgoals = min(subgoals, projects)
+
+    project_columns = [ f"Book {i+1}" for i in range(projects) ]
+    subgoal_columns = { proj:f"{proj} Goal" for proj in project_columns[:subgoals] }
+    essential_columns = {"Date":"Date", "Goal":"Goal"}
+
+    # Words written each day, with skipped days and the occasional day of cutting words
+    written = rng.integers(0, 2 * goal // max(projects, 1) + 1, size=(days, projects))
+    written[ rng.random((days, projects)) < skip_rate ] = 0
+    edits = rng.random((days, projects)) < 0.02
+    written[edits] = -rng.integers(0, goal // 2 + 1, size=edits.sum())
+    written[:1] = 0
+    counts = np.maximum(written.cumsum(axis=0), 0)
+
+    dates = pd.date_range(start, periods=days, freq="D").strftime(date_format)
+    columns = {essential_columns["Goal"]:np.full(days, goal)}
+    columns.update( { subgoal_columns[proj]:np.full(days, subgoal) for proj in subgoal_columns } )
+    columns.update( { proj:counts[:, i] for i, proj in enumerate(project_columns) } )
+    df = pd.DataFrame(columns, index=pd.Index(dates, name=essential_columns["Date"]))
+
+    return df, project_columns, essential_columns, subgoal_columns
+
+def write_log(df, file_name):
+    if file_name[-4:] == ".csv":
+        df.to_csv(file_name)
+    elif file_name[-5:] == ".xlsx":
+        df.to_excel(file_name, sheet_name="Sheet1")
+    else:
+        raise ValueError(f"Unsupported word count file: {file_name} (expected .csv or .xlsx)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m synthetic_logs", description="Write a synthetic word count log")
+    parser.add_argument("file_name", help="Output file (.csv or .xlsx)")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--projects", type=int, default=3)
+    parser.add_argument("--subgoals", type=int, default=1, help="Number of projects with a subgoal column")
+    parser.add_argument("--skip-rate", type=float, default=0.2, help="Fraction of days with no writing on a project")
+    parser.add_argument("--date-format", default="%m/%d/%y")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    df, project_columns, _, subgoal_columns = generate_log(args.days, args.projects, args.subgoals, args.skip_rate, date_format=args.date_format, seed=args.seed)
+    write_log(df, args.file_name)
+    print(f"Wrote {len(df)} days, {len(project_columns)} projects and {len(subgoal_columns)} subgoals to {args.file_name}")
+
+if __name__ == "__main__":
+    main()
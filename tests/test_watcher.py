@@ -0,0 +1,60 @@
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import writing_metrics as wm
+from synthetic_logs import generate_log, write_log
+from watcher import WordCountWatcher
+
+def make_log(tmp_path, days=2000):
+    df, project_columns, essential_columns, subgoal_columns = generate_log(days, 5, 2, seed=3)
+    file_name = str(tmp_path / "log.csv")
+    write_log(df.iloc[:days // 2], file_name)
+    return df, file_name, (project_columns, essential_columns, subgoal_columns)
+
+def touch_later(file_name):
+    # Make sure the change is seen even on filesystems with coarse modification times
+    stat = os.stat(file_name)
+    os.utime(file_name, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+def assert_matches_file(watcher, file_name, columns):
+    df = wm.read_word_count_file(file_name, use_cache=False)
+    assert np.array_equal(watcher.written.to_numpy(), wm.words_written(df, *columns).to_numpy())
+    assert np.array_equal(watcher.net_cumulative.to_numpy(), wm.net_cumulative_words_written(df, *columns).to_numpy())
+
+def test_appended_rows_are_added_incrementally(tmp_path):
+    df, file_name, columns = make_log(tmp_path)
+    watcher = WordCountWatcher(file_name, *columns)
+
+    with open(file_name, "a") as f:
+        f.write(df.iloc[1000:1010].to_csv(header=False))
+    touch_later(file_name)
+    update = watcher.check()
+
+    assert update["reloaded"] is False
+    assert len(update["rows"]) == 10
+    assert_matches_file(watcher, file_name, columns)
+
+def test_same_length_edit_in_the_middle_reloads(tmp_path):
+    df, file_name, columns = make_log(tmp_path)
+    # Only a full check sees an edit this far from both ends of the file
+    watcher = WordCountWatcher(file_name, *columns, verify_every=1)
+
+    # Change one digit of a goal far from both ends of the file, keeping its length
+    with open(file_name, "rb") as f:
+        data = f.read()
+    lines = data.split(b"\n")
+    row = lines[len(lines) // 2].split(b",")
+    row[1] = row[1][:-1] + (b"1" if row[1][-1:] != b"1" else b"2")
+    lines[len(lines) // 2] = b",".join(row)
+    edited = b"\n".join(lines)
+    assert len(edited) == len(data)
+    with open(file_name, "wb") as f:
+        f.write(edited)
+    touch_later(file_name)
+
+    assert watcher.check(allow_reload=False) == {"reload_needed":True}
+    assert watcher.check() == {"reloaded":True}
+    assert_matches_file(watcher, file_name, columns)
@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import writing_metrics as wm
+from synthetic_logs import generate_log, write_log
+from word_count_db import WordCountDatabase
+
+test_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test.csv")
+
+def test_read_frame_matches_the_imported_file(tmp_path):
+    df, _, _, _ = generate_log(400, 6, 3, seed=2)
+    generated_file = str(tmp_path / "log.csv")
+    write_log(df, generated_file)
+
+    for word_count_file in [ test_file, generated_file ]:
+        database = WordCountDatabase(str(tmp_path / (os.path.basename(word_count_file) + ".sqlite")))
+        database.import_file(word_count_file)
+        expected = wm.read_word_count_file(word_count_file, use_cache=False)
+        assert database.read_frame().equals(expected)
+
+        # Ranges and projects are read from the database, but give the same rows and columns as the file
+        projects, _ = database.project_columns()
+        start, end = expected.index[10], expected.index[20]
+        frame = database.read_frame(projects[:1], start, end)
+        assert frame.equals(expected.loc[start:end, frame.columns])
+
+def test_partial_append_carries_other_projects_forward(tmp_path):
+    database = WordCountDatabase(str(tmp_path / "words.sqlite"))
+    database.append("01/01/23", {"Goal":1500, "Test Book 1 Goal":500, "Test Book 1":4000, "Test Book 2":12000})
+    database.append("01/02/23", {"Test Book 1":4500})
+
+    df = database.read_frame()
+    assert df.loc["2023-01-02", "Test Book 2"] == 12000
+    assert df.loc["2023-01-02", "Goal"] == 1500
+    assert database.project_columns() == (["Test Book 1", "Test Book 2"], {"Test Book 1":"Test Book 1 Goal"})
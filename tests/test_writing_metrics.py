@@ -0,0 +1,53 @@
+import os
+import sys
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import writing_metrics as wm
+from synthetic_logs import generate_log
+
+test_file = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test.csv")
+
+def logs():
+    df = wm.read_word_count_file(test_file, use_cache=False)
+    yield df, (wm.project_columns, wm.essential_columns, wm.subgoal_columns)
+    df, project_columns, essential_columns, subgoal_columns = generate_log(400, 4, 2, seed=5)
+    yield wm.prepare_word_count_frame(df), (project_columns, essential_columns, subgoal_columns)
+
+def assert_metrics_equal(metrics, expected):
+    if expected is None:
+        assert metrics is None
+        return
+    assert list(metrics) == list(expected)
+    for key in expected:
+        pd.testing.assert_series_equal(metrics[key], expected[key], check_dtype=False, check_names=False)
+
+def test_all_non_cumulative_metrics_matches_non_cumulative_metrics():
+    for df, columns in logs():
+        standard, net, standard_weekday, net_weekday = wm.all_non_cumulative_metrics(df, *columns, wm.date_format)
+
+        assert_metrics_equal(standard, wm.non_cumulative_metrics(df, *columns))
+        assert_metrics_equal(net, wm.non_cumulative_metrics(df, *columns, net=True))
+        for i, weekday in enumerate(wm.weekday_to_string(list(range(7)))):
+            assert_metrics_equal(standard_weekday[weekday], wm.non_cumulative_metrics(df, *columns, weekday=i))
+            assert_metrics_equal(net_weekday[weekday], wm.non_cumulative_metrics(df, *columns, net=True, weekday=i))
+
+def test_incremental_metrics_match_batch_metrics_after_save_load_and_append(tmp_path):
+    for df, columns in logs():
+        half = len(df) // 2
+        metrics = wm.IncrementalMetrics.from_history(df.iloc[:half], *columns)
+        metrics.save(str(tmp_path / "metrics.json"))
+        metrics = wm.IncrementalMetrics.load(str(tmp_path / "metrics.json"))
+        for date, row in zip(df.index[half:], df.iloc[half:].to_dict("records")):
+            assert metrics.append(date, row)
+        # Days already seen are skipped
+        assert not metrics.append(df.index[-1], df.iloc[-1].to_dict())
+
+        standard, net, standard_weekday, net_weekday = metrics.metrics()
+        expected = wm.all_non_cumulative_metrics(df, *columns, wm.date_format)
+        assert_metrics_equal(standard, expected[0])
+        assert_metrics_equal(net, expected[1])
+        for weekday in expected[2]:
+            assert_metrics_equal(standard_weekday[weekday], expected[2][weekday])
+            assert_metrics_equal(net_weekday[weekday], expected[3][weekday])
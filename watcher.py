@@ -0,0 +1,166 @@
+import hashlib
+import io
+import os
+import threading
+import numpy as np
+import pandas as pd
+import writing_metrics as wm
+
+# Keeps the words written, cumulative words written, and metrics of a word count file up to date as it changes
+# Rows appended to a CSV are parsed on their own (only the new bytes) and added incrementally,
+# anything else (an edited earlier row, a shorter file, an XLSX file) falls back to reloading the whole file
+# Earlier rows are checked by comparing the bytes at the start of the file and just before the last read row, which only catches edits there,
+# so with verify_every set every that many changes also hash every byte already read (reading the whole file) to catch an edit anywhere
+class WordCountWatcher:
+    # Bytes at the start of the file and just before the last read row that are checked to see whether earlier rows were edited
+    window = 4096
+
+    def __init__(self, word_count_file, project_columns, essential_columns, subgoal_columns, date_format=wm.date_format, verify_every=None):
+        self.word_count_file = word_count_file
+        self.verify_every = verify_every
+        self.changes = 0
+        self.columns = (project_columns, essential_columns, subgoal_columns)
+        self.pairs = wm.project_goal_pairs(project_columns, essential_columns, subgoal_columns)
+        self.date_format = date_format
+        self.csv = word_count_file[-4:] == ".csv"
+        # Held while checking or reloading, so a watcher can be shared with worker threads
+        self.lock = threading.RLock()
+        self.reload()
+
+    def reload(self):
+        if self.csv:
+            # Read the bytes once, so the frame and the offset into the file always agree
+            self.stat = os.stat(self.word_count_file)
+            with open(self.word_count_file, "rb") as f:
+                data = f.read()
+            self.offset = data.rfind(b"\n") + 1
+            self.header = data[:data.find(b"\n") + 1]
+            self.head = data[:min(self.window, self.offset)]
+            self.tail = data[max(self.offset - self.window, 0):self.offset]
+            self.read_hash = hashlib.blake2b(memoryview(data)[:self.offset])
+            df = pd.read_csv(io.BytesIO(data[:self.offset]), index_col=0)
+            self.df = wm.prepare_word_count_frame(df, self.date_format)
+        else:
+            self.stat = os.stat(self.word_count_file)
+            self.df = wm.read_word_count_file(self.word_count_file, self.date_format)
+
+        self.written = wm.words_written(self.df, *self.columns)
+        self.cumulative = pd.DataFrame(self.written.to_numpy(dtype=np.int64).cumsum(axis=0), index=self.written.index, columns=self.written.columns)
+        self.net = wm.net_frame(self.written, *self.pairs)
+        self.net_cumulative = wm.net_frame(self.cumulative, *self.pairs)
+        self.metrics = wm.IncrementalMetrics.from_history(self.df, *self.columns, self.date_format)
+
+    # Whether the bytes already read look the same (the header and the rows just before the offset), or with verify all are the same
+    def unchanged_before_offset(self, f, verify=False):
+        if verify:
+            f.seek(0)
+            read_hash = hashlib.blake2b()
+            remaining = self.offset
+            while remaining > 0:
+                block = f.read(min(remaining, 2**20))
+                if len(block) == 0:
+                    return False
+                read_hash.update(block)
+                remaining -= len(block)
+            return read_hash.digest() == self.read_hash.digest()
+
+        f.seek(0)
+        if f.read(len(self.head)) != self.head:
+            return False
+        f.seek(max(self.offset - self.window, 0))
+        return f.read(len(self.tail)) == self.tail
+
+    # Look for changes once, returning None if nothing changed, otherwise a dict describing the update:
+    #   {"reloaded":True} after a full reload (or {"reload_needed":True} if reloading isn't allowed, e.g. on a GUI thread)
+    #   {"reloaded":False, "rows":..., "written":..., "cumulative":..., "net":..., "net_cumulative":...} with the appended rows and their new series
+    def check(self, allow_reload=True):
+        with self.lock:
+            return self.check_file(allow_reload)
+
+    def check_file(self, allow_reload):
+        try:
+            stat = os.stat(self.word_count_file)
+        except FileNotFoundError:
+            return None
+        if (stat.st_mtime_ns, stat.st_size) == (self.stat.st_mtime_ns, self.stat.st_size):
+            return None
+
+        self.changes += 1
+        verify = not self.verify_every is None and self.changes % self.verify_every == 0
+        data = None
+        if self.csv and stat.st_size >= self.offset:
+            with open(self.word_count_file, "rb") as f:
+                if self.unchanged_before_offset(f, verify):
+                    f.seek(self.offset)
+                    data = f.read()
+
+        if data is None:
+            if not allow_reload:
+                return {"reload_needed":True}
+            self.reload()
+            return {"reloaded":True}
+
+        # Only complete rows are read, a partly written row is picked up on a later check
+        self.stat = stat
+        end = data.rfind(b"\n") + 1
+        if end == 0:
+            return None
+        rows = pd.read_csv(io.BytesIO(self.header + data[:end]), index_col=0)
+        rows = wm.prepare_word_count_frame(rows, self.date_format)
+        self.offset += end
+        self.tail = (self.tail + data[:end])[-self.window:]
+        if len(self.head) < self.window:
+            self.head = (self.head + data[:end])[:self.window]
+        self.read_hash.update(memoryview(data)[:end])
+
+        return self.append_rows(rows)
+
+    # Extend the series and metrics with new rows, carrying over the last row and the cumulative totals
+    def append_rows(self, rows):
+        if len(self.df) == 0:
+            written = wm.words_written(rows, *self.columns)
+            carry = 0
+        else:
+            written = wm.words_written(pd.concat([self.df.iloc[-1:], rows]), *self.columns).iloc[1:]
+            carry = self.cumulative.iloc[-1].to_numpy()
+        cumulative = pd.DataFrame(written.to_numpy(dtype=np.int64).cumsum(axis=0) + carry, index=written.index, columns=written.columns)
+        net = wm.net_frame(written, *self.pairs)
+        net_cumulative = wm.net_frame(cumulative, *self.pairs)
+
+        self.df = pd.concat([self.df, rows])
+        self.written = pd.concat([self.written, written])
+        self.cumulative = pd.concat([self.cumulative, cumulative])
+        self.net = pd.concat([self.net, net])
+        self.net_cumulative = pd.concat([self.net_cumulative, net_cumulative])
+        for date, row in zip(rows.index, rows.to_dict("records")):
+            self.metrics.append(date, row)
+
+        return {"reloaded":False, "rows":rows, "written":written, "cumulative":cumulative, "net":net, "net_cumulative":net_cumulative}
+
+    # inotify (through the optional inotify_simple package) on the file's directory, so editors that replace the file are seen too
+    def open_inotify(self):
+        try:
+            from inotify_simple import INotify, flags
+            inotify = INotify()
+            directory = os.path.dirname(os.path.abspath(self.word_count_file))
+            inotify.add_watch(directory, flags.MODIFY | flags.CLOSE_WRITE | flags.MOVED_TO | flags.CREATE)
+            return inotify
+        except (ImportError, OSError):
+            return None
+
+    # Call callback with every update until stop is set, waiting on inotify events or polling every interval seconds
+    def watch(self, callback, interval=1.0, stop=None):
+        stop = threading.Event() if stop is None else stop
+        inotify = self.open_inotify()
+        try:
+            while not stop.is_set():
+                if inotify is None:
+                    stop.wait(interval)
+                else:
+                    inotify.read(timeout=int(interval * 1000))
+                update = self.check()
+                if not update is None:
+                    callback(update)
+        finally:
+            if not inotify is None:
+                inotify.close()
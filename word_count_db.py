@@ -0,0 +1,260 @@
+import argparse
+import contextlib
+import sqlite3
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import writing_metrics as wm
+
+# Word counts stored in SQLite in long format, one row per project per day, instead of one wide file with a column per project
+#   counts(project, date, count, goal) keyed (and so indexed) on (project, date)
+#   projects(project, goal_column, position, goal_position) remembers each project's subgoal column and where its columns go in the wide layout
+#   columns(name, label) remembers the labels of the essential columns
+# The overall goal is kept as the goal of the "Total" project (which has no counts)
+# Reads are pushed down to SQL (only the requested projects and dates are touched) and pivoted back into the wide frame
+# read_word_count_file returns, so the rest of writing_metrics works on them unchanged
+# e.g. python -m word_count_db words.sqlite --import test.csv
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS counts (project TEXT NOT NULL, date TEXT NOT NULL, count INTEGER, goal INTEGER, PRIMARY KEY (project, date)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS counts_date ON counts (date);
+CREATE TABLE IF NOT EXISTS projects (project TEXT PRIMARY KEY, goal_column TEXT, position INTEGER, goal_position INTEGER);
+CREATE TABLE IF NOT EXISTS columns (name TEXT PRIMARY KEY, label TEXT);
+"""
+
+class WordCountDatabase:
+    def __init__(self, file_name, date_format=wm.date_format, timeout=30.0):
+        self.file_name = file_name
+        self.date_format = date_format
+        self.timeout = timeout
+        self.local = threading.local()
+        with self.connection() as connection:
+            connection.executescript(SCHEMA)
+            # Databases made before the goal columns had positions of their own
+            if not "goal_position" in [ row[1] for row in connection.execute("PRAGMA table_info(projects)") ]:
+                connection.execute("ALTER TABLE projects ADD COLUMN goal_position INTEGER")
+
+    # One connection per thread, in WAL mode so appends from other threads and processes don't block readers
+    def connection(self):
+        if not hasattr(self.local, "connection"):
+            connection = sqlite3.connect(self.file_name, timeout=self.timeout)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return self.local.connection
+
+    # One write transaction, taking the write lock up front (BEGIN IMMEDIATE) so nothing read inside it can change before it's written,
+    # e.g. two appends can't give new projects the same position
+    # Transactions opened inside one (e.g. write_frame inside append) are part of it
+    @contextlib.contextmanager
+    def transaction(self):
+        connection = self.connection()
+        if connection.in_transaction:
+            yield connection
+            return
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            yield connection
+        except BaseException:
+            connection.rollback()
+            raise
+        connection.commit()
+
+    # Dates given as strings are in date_format, like the dates of the word count files
+    def to_timestamp(self, date):
+        if isinstance(date, str):
+            return pd.Timestamp(datetime.strptime(date, self.date_format))
+        return pd.Timestamp(date)
+
+    def close(self):
+        if hasattr(self.local, "connection"):
+            self.local.connection.close()
+            del self.local.connection
+
+    def essential_columns(self):
+        labels = dict(self.connection().execute("SELECT name, label FROM columns").fetchall())
+        return {"Date":labels.get("Date", wm.essential_columns["Date"]), "Goal":labels.get("Goal", wm.essential_columns["Goal"])}
+
+    def set_essential_columns(self, essential_columns):
+        with self.transaction() as connection:
+            connection.executemany("INSERT OR REPLACE INTO columns (name, label) VALUES (?, ?)", list(essential_columns.items()))
+
+    # The project and subgoal columns, in the order of the wide layout
+    def project_columns(self):
+        rows = self.connection().execute("SELECT project, goal_column FROM projects WHERE project != 'Total' ORDER BY position").fetchall()
+        project_columns = [ project for project, _ in rows ]
+        subgoal_columns = { project:goal for project, goal in rows if not goal is None }
+        return project_columns, subgoal_columns
+
+    # Every column of the wide layout (the goal, and each project and its subgoal) in order
+    # The overall goal is the goal column of "Total"
+    def layout(self):
+        essential_columns = self.essential_columns()
+        columns = []
+        for project, goal_column, position, goal_position in self.connection().execute("SELECT project, goal_column, position, goal_position FROM projects"):
+            if project == "Total":
+                columns.append((goal_position, essential_columns["Goal"]))
+                continue
+            columns.append((position, project))
+            if not goal_column is None:
+                columns.append((goal_position, goal_column))
+        # Columns without a position (from databases made before they had one) go last
+        return [ label for _, label in sorted(columns, key=lambda column: (column[0] is None, column[0] or 0)) ]
+
+    # Adding a project is one row here, rather than a new column through every row of a wide file
+    # New columns go after every column already in the layout, in the order they have in layout (e.g. the columns of the frame they come from)
+    def add_projects(self, project_columns, subgoal_columns, layout=None):
+        with self.transaction() as connection:
+            known = { project for (project,) in connection.execute("SELECT project FROM projects") }
+            new = [ project for project in dict.fromkeys(project_columns) if not project in known ]
+            if len(new) == 0:
+                return
+            if layout is None:
+                layout = [ column for project in new for column in [ subgoal_columns.get(project), project ] if not column is None ]
+            start = connection.execute("SELECT MAX(COALESCE(MAX(position), -1), COALESCE(MAX(goal_position), -1)) + 1 FROM projects").fetchone()[0]
+            positions = { column:start + i for i, column in enumerate(layout) }
+            rows = [ (project, subgoal_columns.get(project), positions.get(project), positions.get(subgoal_columns.get(project))) for project in new ]
+            connection.executemany("INSERT INTO projects (project, goal_column, position, goal_position) VALUES (?, ?, ?, ?)", rows)
+
+    def add_project(self, project, goal_column=None):
+        self.add_projects([ project ], {} if goal_column is None else {project:goal_column})
+
+    # Write a wide frame (as returned by read_word_count_file) in one transaction, replacing any rows already there for the same days
+    def write_frame(self, df, project_columns, essential_columns, subgoal_columns):
+        dates = np.asarray(wm.parse_dates(df.index, self.date_format).strftime("%Y-%m-%d"), dtype=object)
+        rows = []
+        for project in ["Total"] + list(project_columns):
+            goal_column = essential_columns["Goal"] if project == "Total" else subgoal_columns.get(project)
+            counts = [ None ] * len(df) if project == "Total" else df[project].to_numpy(dtype=np.int64).tolist()
+            goals = [ None ] * len(df) if goal_column is None else df[goal_column].to_numpy(dtype=np.int64).tolist()
+            rows += zip([ project ] * len(df), dates, counts, goals)
+
+        with self.transaction() as connection:
+            self.set_essential_columns(essential_columns)
+            self.add_projects(["Total"] + list(project_columns), {**subgoal_columns, "Total":essential_columns["Goal"]}, list(df.columns))
+            connection.executemany("INSERT OR REPLACE INTO counts (project, date, count, goal) VALUES (?, ?, ?, ?)", rows)
+        return len(rows)
+
+    # Bulk import a CSV or XLSX word count file, working out the columns from the file unless they're given
+    def import_file(self, word_count_file, project_columns=None, essential_columns=wm.essential_columns, subgoal_columns=None):
+        df = wm.read_word_count_file(word_count_file, self.date_format, use_cache=False)
+        inferred_projects, inferred_subgoals = wm.infer_columns(df, essential_columns)
+        project_columns = inferred_projects if project_columns is None else project_columns
+        subgoal_columns = inferred_subgoals if subgoal_columns is None else subgoal_columns
+        return self.write_frame(df, project_columns, essential_columns, subgoal_columns)
+
+    # Append (or replace) one day, with row mapping column labels to values like a row of the wide layout
+    # Projects that aren't in the database yet are added, with their subgoal columns taken from subgoal_columns,
+    # or worked out from the labels of the row (e.g. "New Goal" for "New") the way wm.infer_columns does if it isn't given
+    # The whole append is one transaction, so a concurrent append never sees a project without its counts
+    def append(self, date, row, subgoal_columns=None):
+        with self.transaction() as connection:
+            essential_columns = self.essential_columns()
+            project_columns, known_subgoals = self.project_columns()
+            if subgoal_columns is None:
+                _, subgoal_columns = wm.infer_columns(pd.DataFrame(columns=list(row)), essential_columns)
+            goal_labels = set(subgoal_columns.values()) | set(known_subgoals.values()) | { essential_columns["Goal"] }
+            new = [ col for col in row if not col in project_columns and not col in goal_labels ]
+            self.add_projects(new, subgoal_columns, list(row))
+            project_columns, subgoal_columns = self.project_columns()
+
+            frame = pd.DataFrame([ row ], index=pd.DatetimeIndex([ self.to_timestamp(date) ]))
+            columns = [ project for project in project_columns if project in row ]
+            subgoals = { project:goal for project, goal in subgoal_columns.items() if project in columns and goal in row }
+            if essential_columns["Goal"] in row:
+                return self.write_frame(frame, columns, essential_columns, subgoals)
+
+            # Without the overall goal only the projects are written
+            rows = [ (project, frame.index[0].strftime("%Y-%m-%d"), int(row[project]), int(row[subgoals[project]]) if project in subgoals else None) for project in columns ]
+            connection.executemany("INSERT OR REPLACE INTO counts (project, date, count, goal) VALUES (?, ?, ?, ?)", rows)
+            return len(rows)
+
+    # The long rows for some projects (all by default) between two dates (inclusive, either can be left open)
+    def query(self, project_columns=None, start=None, end=None):
+        conditions, parameters = [], []
+        if not project_columns is None:
+            projects = list(project_columns) + ["Total"]
+            conditions.append(f"project IN ({', '.join('?' * len(projects))})")
+            parameters += projects
+        if not start is None:
+            conditions.append("date >= ?")
+            parameters.append(self.to_timestamp(start).strftime("%Y-%m-%d"))
+        if not end is None:
+            conditions.append("date <= ?")
+            parameters.append(self.to_timestamp(end).strftime("%Y-%m-%d"))
+
+        # Rows come back in the order of the key, so SQLite doesn't have to sort them
+        where = f" WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+        rows = self.connection().execute(f"SELECT project, date, count, goal FROM counts{where} ORDER BY project, date", parameters).fetchall()
+        return pd.DataFrame.from_records(rows, columns=["project", "date", "count", "goal"], coerce_float=True)
+
+    # Each project's last row before start, so the days of a range can carry its count and goal forward from before the range
+    # That's one lookup on the key per project, however much history there is before start
+    def last_rows_before(self, project_columns, start):
+        start = self.to_timestamp(start).strftime("%Y-%m-%d")
+        connection = self.connection()
+        rows = []
+        for project in list(project_columns) + ["Total"]:
+            rows += connection.execute("SELECT project, date, count, goal FROM counts WHERE project = ? AND date < ? ORDER BY date DESC LIMIT 1", (project, start)).fetchall()
+        return pd.DataFrame.from_records(rows, columns=["project", "date", "count", "goal"], coerce_float=True)
+
+    # The wide frame read_word_count_file would give for the same data: the dates as the index, the goal, and each project and its subgoal
+    # Days a project has no row carry its last count and goal forward (as a wide file repeats them), and only count as 0 before its first row
+    def read_frame(self, project_columns=None, start=None, end=None):
+        essential_columns = self.essential_columns()
+        all_projects, subgoal_columns = self.project_columns()
+        projects = all_projects if project_columns is None else [ project for project in all_projects if project in project_columns ]
+        long = self.query(projects if not project_columns is None else None, start, end)
+
+        if len(long) > 0:
+            before = None if start is None else self.last_rows_before(projects, start)
+            if not before is None and len(before) > 0:
+                long = pd.concat([ before, long ], ignore_index=True)
+            wide = long.pivot(index="date", columns="project", values=["count", "goal"]).sort_index().ffill()
+            if not start is None:
+                wide = wide[ wide.index >= self.to_timestamp(start).strftime("%Y-%m-%d") ]
+            dates, counts, goals = wide.index, wide["count"], wide["goal"]
+        else:
+            dates, counts, goals = pd.Index([], dtype=object), pd.DataFrame(), pd.DataFrame()
+
+        columns = {essential_columns["Goal"]:goals["Total"] if "Total" in goals else 0}
+        for project in projects:
+            if project in subgoal_columns:
+                columns[subgoal_columns[project]] = goals[project] if project in goals else 0
+            columns[project] = counts[project] if project in counts else 0
+
+        # In the order of the wide file it came from
+        layout = self.layout()
+        order = [ col for col in layout if col in columns ] + [ col for col in columns if not col in layout ]
+        df = pd.DataFrame(columns, index=dates)[order].fillna(0).astype(np.int64)
+        df.index = pd.DatetimeIndex(pd.to_datetime(dates, format="%Y-%m-%d"), name=essential_columns["Date"])
+        return wm.compact_frame(df)
+
+    def date_range(self):
+        return self.connection().execute("SELECT MIN(date), MAX(date) FROM counts").fetchone()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m word_count_db", description="Import word count files into (and read them from) a SQLite database")
+    parser.add_argument("database", help="SQLite database file (created if it doesn't exist)")
+    parser.add_argument("--import", dest="imports", nargs="+", default=[], help="CSV or XLSX word count files to import")
+    parser.add_argument("--date-format", default=wm.date_format, help="Format of the dates in the imported files and of --start and --end")
+    parser.add_argument("--projects", nargs="+", default=None, help="Only show these projects")
+    parser.add_argument("--start", default=None, help="First day to show")
+    parser.add_argument("--end", default=None, help="Last day to show")
+    parser.add_argument("--rows", type=int, default=5, help="Number of rows to show (0 for all)")
+    args = parser.parse_args(argv)
+
+    database = WordCountDatabase(args.database, args.date_format)
+    for word_count_file in args.imports:
+        try:
+            rows = database.import_file(word_count_file)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print(f"Imported {rows} rows from {word_count_file}")
+
+    df = database.read_frame(args.projects, args.start, args.end)
+    print(df if args.rows <= 0 else df[:args.rows])
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 import pandas as pd
 import numpy as np
-import seaborn as sns
 import os
+import sys
+import json
+import math
+import heapq
+import hashlib
+import weakref
+import tempfile
+import zipfile
 from datetime import datetime
-import matplotlib.pyplot as plt
 from collections import OrderedDict
-
-# Set working directory to file directory
-os.chdir(os.path.dirname(os.path.abspath(__file__)))
+from writing_project import GoalFrequency
 
 word_count_file = "test.csv"
 
@@ -45,19 +49,234 @@ def project_goal_pairs(project_columns, essential_columns, subgoal_columns, tota
 
     return projects, goals
 
-def read_word_count_file(word_count_file):
-    df = None
+# Boolean array (days x columns) of which days each column is on hiatus
+# hiatus maps a project column to its writing_project.Project (or just its Hiatus), and a hiatus for "Total" applies to every column
+def hiatus_mask(dates, columns, hiatus):
+    dates = parse_dates(dates)
+    mask = np.zeros((len(dates), len(columns)), dtype=bool)
+    if not hiatus:
+        return mask
+
+    spans = { col:getattr(hiatus[col], "hiatus", hiatus[col]) for col in hiatus }
+    if "Total" in spans:
+        mask[:] = spans["Total"].mask(dates)[:, None]
+    for i, col in enumerate(columns):
+        if col in spans and not col == "Total":
+            mask[:, i] |= spans[col].mask(dates)
+
+    return mask
+
+# Leave the days each column is on hiatus out of the values (as NaN)
+def mask_hiatus(values, hiatus):
+    if not hiatus:
+        return values
+    return values.mask( hiatus_mask(values.index, list(values.columns), hiatus) )
+
+# Work out the project and subgoal columns from the columns of a word count file
+# Every column other than the goal is a project, unless it is named "<project> Goal" for one of the other columns
+def infer_columns(df, essential_columns, subgoal_suffix=" Goal"):
+    columns = [ col for col in df.columns if not col == essential_columns["Goal"] and not col == essential_columns["Date"] ]
+    subgoal_columns = { col[:-len(subgoal_suffix)]:col for col in columns if col.endswith(subgoal_suffix) and col[:-len(subgoal_suffix)] in columns }
+    project_columns = [ col for col in columns if not col in subgoal_columns.values() ]
+
+    return project_columns, subgoal_columns
+
+# Read the word count file, parsing the dates in the index once so later lookups don't need to
+# The parsed frame is cached next to the file and reused until the file changes
+# SQLite word count databases (see word_count_db.py) are queried instead, giving the same frame
+def read_word_count_file(word_count_file, date_format=date_format, use_cache=True):
+    if word_count_file[-7:] == ".sqlite":
+        from word_count_db import WordCountDatabase
+        return WordCountDatabase(word_count_file, date_format).read_frame()
+    check_word_count_file_type(word_count_file)
+    if use_cache:
+        df = read_word_count_cache(word_count_file, date_format)
+        if not df is None:
+            return df
+
     if word_count_file[-4:] == ".csv":
         df = pd.read_csv(word_count_file, index_col=0)
-    elif word_count_file[-5:] == ".xlsx":
+    else:
         df = pd.read_excel(word_count_file, sheet_name="Sheet1", index_col=0)
+
+    df = prepare_word_count_frame(df, date_format)
+    if use_cache:
+        write_word_count_cache(df, word_count_file, date_format)
     
     return df
 
-def get_weekday(date, date_format):
-    days = [datetime.strptime(day, date_format) for day in date]
-    weekdays = np.array( [ day.weekday() for day in days ] )
-    return weekdays
+def check_word_count_file_type(word_count_file):
+    if not word_count_file[-4:] == ".csv" and not word_count_file[-5:] == ".xlsx":
+        raise ValueError(f"Unsupported word count file: {word_count_file} (expected .csv or .xlsx)")
+
+# Parse the dates and compact the columns of a freshly read word count frame
+def prepare_word_count_frame(df, date_format=date_format):
+    df.index = parse_dates(df.index, date_format)
+    return compact_frame(df)
+
+# Store the integer columns as int32 when their values fit, rather than the int64 the readers default to
+def compact_frame(df):
+    limits = np.iinfo(np.int32)
+    compact = { col:np.int32 for col in df.columns if pd.api.types.is_integer_dtype(df[col]) and len(df) > 0 and df[col].min() >= limits.min and df[col].max() <= limits.max }
+    return df.astype(compact) if len(compact) > 0 else df
+
+#####################################################################################################################################################
+##### WORD COUNT FILE CACHE #########################################################################################################################
+#####################################################################################################################################################
+
+# The cache is an npz file next to the word count file holding the index and each column as typed arrays
+# It is only valid for the modification time, size, and date format it was written with
+
+def word_count_cache_file(word_count_file):
+    return word_count_file + ".cache.npz"
+
+def word_count_file_signature(word_count_file, date_format):
+    stat = os.stat(word_count_file)
+    return np.array([ str(stat.st_mtime_ns), str(stat.st_size), date_format ])
+
+def read_word_count_cache(word_count_file, date_format=date_format):
+    cache_file = word_count_cache_file(word_count_file)
+    if not os.path.exists(cache_file):
+        return None
+
+    try:
+        with np.load(cache_file, allow_pickle=False) as cache:
+            if not np.array_equal( cache["signature"], word_count_file_signature(word_count_file, date_format) ):
+                return None
+            index_name = str(cache["index_name"]) if cache["has_index_name"] else None
+            index = pd.DatetimeIndex(cache["index"], name=index_name)
+            columns = [ str(col) for col in cache["columns"] ]
+            df = pd.DataFrame({ col:cache[f"column_{i}"] for i, col in enumerate(columns) }, index=index)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        # A missing, stale, or corrupt (e.g. truncated) cache just means reading the file again
+        return None
+
+    return df
+
+def write_word_count_cache(df, word_count_file, date_format=date_format):
+    # Columns that aren't plain numbers can't be stored without pickling, so don't cache those files
+    if any( dtype == object for dtype in df.dtypes ):
+        return False
+
+    cache_file = word_count_cache_file(word_count_file)
+    arrays = { f"column_{i}":df[col].to_numpy() for i, col in enumerate(df.columns) }
+    temp_file = None
+    try:
+        # Write to a temporary file of its own first, so a reader never sees a partially written cache
+        # and two processes writing the cache at once can't write into the same file
+        handle, temp_file = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(cache_file)), suffix=".tmp")
+        with os.fdopen(handle, "wb") as f:
+            np.savez(f, signature=word_count_file_signature(word_count_file, date_format),
+                     index=df.index.to_numpy(), index_name=np.array(df.index.name or ""), has_index_name=np.array(not df.index.name is None),
+                     columns=np.array([ str(col) for col in df.columns ]), **arrays)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        if not temp_file is None and os.path.exists(temp_file):
+            os.remove(temp_file)
+        return False
+
+    return True
+
+#####################################################################################################################################################
+##### STREAMING #####################################################################################################################################
+#####################################################################################################################################################
+
+# For logs too large to hold in memory, read them in chunks of rows and compute the series chunk by chunk
+# Only the columns that are needed are read, and every count is read as an int32
+# e.g. for chunk in stream_cumulative( stream_words_written( read_word_count_chunks(file, ...), ... ) ): ...
+
+def needed_columns(project_columns, essential_columns, subgoal_columns):
+    _, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns)
+    return list(dict.fromkeys( [essential_columns["Date"]] + goals + list(project_columns) ))
+
+# Yield the word count file as DataFrames of at most chunksize rows, with parsed dates as the index
+def read_word_count_chunks(word_count_file, project_columns, essential_columns, subgoal_columns, date_format=date_format, chunksize=100000):
+    check_word_count_file_type(word_count_file)
+    columns = needed_columns(project_columns, essential_columns, subgoal_columns)
+    dtypes = { col:np.int32 for col in columns[1:] }
+
+    if word_count_file[-4:] == ".csv":
+        chunks = pd.read_csv(word_count_file, usecols=columns, dtype=dtypes, index_col=essential_columns["Date"], chunksize=chunksize)
+    else:
+        chunks = read_excel_chunks(word_count_file, columns, dtypes, chunksize)
+
+    for chunk in chunks:
+        chunk.index = parse_dates(chunk.index, date_format)
+        yield chunk[columns[1:]]
+
+# pandas can't read Excel files in chunks, so go through openpyxl's read only mode row by row
+def read_excel_chunks(word_count_file, columns, dtypes, chunksize):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(word_count_file, read_only=True, data_only=True)
+    try:
+        rows = workbook["Sheet1"].iter_rows(values_only=True)
+        header = list(next(rows))
+        missing = [ col for col in columns if not col in header ]
+        if len(missing) > 0:
+            raise ValueError(f"Columns {missing} are not in {word_count_file}")
+        positions = [ header.index(col) for col in columns ]
+
+        chunk = []
+        for row in rows:
+            chunk.append([ row[i] for i in positions ])
+            if len(chunk) == chunksize:
+                yield pd.DataFrame(chunk, columns=columns).set_index(columns[0]).astype(dtypes)
+                chunk = []
+        if len(chunk) > 0:
+            yield pd.DataFrame(chunk, columns=columns).set_index(columns[0]).astype(dtypes)
+    finally:
+        workbook.close()
+
+# Words written for each chunk, carrying the last row of each chunk over so the first diff of the next one is right
+def stream_words_written(chunks, project_columns, essential_columns, subgoal_columns, hiatus=None):
+    previous = None
+    for chunk in chunks:
+        if previous is None:
+            written = words_written(chunk, project_columns, essential_columns, subgoal_columns, hiatus)
+        else:
+            written = words_written(pd.concat([previous, chunk]), project_columns, essential_columns, subgoal_columns, hiatus).iloc[1:]
+        previous = chunk.iloc[-1:]
+        yield written
+
+# Net words written for each chunk of words written
+def stream_net(written_chunks, project_columns, essential_columns, subgoal_columns, total_only=False):
+    projects, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns, total_only)
+    for written in written_chunks:
+        yield net_frame(written, projects, goals)
+
+# Running totals for each chunk (of words written or net words written), carrying the totals across chunks
+def stream_cumulative(chunks):
+    carry = None
+    for chunk in chunks:
+        values = chunk.to_numpy(dtype=np.int64).cumsum(axis=0)
+        if not carry is None:
+            values += carry
+        if len(values) > 0:
+            carry = values[-1]
+        yield pd.DataFrame(values, index=chunk.index, columns=chunk.columns, copy=False)
+
+#####################################################################################################################################################
+##### DATES #########################################################################################################################################
+#####################################################################################################################################################
+
+# Convert dates to a DatetimeIndex (dates that have already been parsed are left as they are)
+def parse_dates(dates, date_format=date_format):
+    if isinstance(dates, pd.DatetimeIndex):
+        return dates
+    return pd.DatetimeIndex( pd.to_datetime(dates, format=date_format), name=getattr(dates, "name", None) )
+
+def get_weekday(date, date_format=date_format):
+    return parse_dates(date, date_format).weekday.to_numpy()
+
+def get_week(date, date_format=date_format):
+    return parse_dates(date, date_format).isocalendar().week.to_numpy()
+
+def get_month(date, date_format=date_format):
+    return parse_dates(date, date_format).month.to_numpy()
+
+def get_year(date, date_format=date_format):
+    return parse_dates(date, date_format).year.to_numpy()
 
 def weekday_to_string(days, lowercase=False):
     weekdays = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
@@ -73,40 +292,74 @@ def weekday_to_int(days):
 ##### WORDS WRITTEN FUNCTIONS #######################################################################################################################
 #####################################################################################################################################################
 
+# Smallest integer type that can hold every value up to bound in magnitude
+def compact_int_dtype(bound):
+    for dtype in (np.int16, np.int32):
+        if bound <= np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
 # Get words written by subtracting previous day's word count from current day's word count
-# Do this for each project (column) and Total
-def words_written(df, project_columns, essential_columns, subgoal_columns):
-    diff = df[ project_columns ].diff()
-    _, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns)
-    diff[ goals ] = df[ goals ]
-    diff.loc[ diff.index[0] ] = 0
-    diff["Total"] = diff[project_columns].sum(axis=1)
+# Returned as one integer array with a column for each project, goal, and Total (in the order of the returned columns)
+# Goals are 0 on the days their project is on hiatus, so planned breaks don't count against them
+def words_written_array(df, project_columns, essential_columns, subgoal_columns, hiatus=None):
+    projects, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns)
+    columns = list(project_columns) + goals + ["Total"]
+    n = len(project_columns)
 
-    return diff.astype(int)
+    values = np.zeros((len(df), len(columns)), dtype=np.int64)
+    values[1:, :n] = np.diff(df[project_columns].to_numpy(dtype=np.int64), axis=0)
+    values[1:, n:-1] = df[goals].to_numpy(dtype=np.int64)[1:]
+    values[:, -1] = values[:, :n].sum(axis=1)
+    if hiatus:
+        values[:, n:-1][ hiatus_mask(df.index, projects, hiatus) ] = 0
+
+    # The type also has to fit the cumulative sums (and their differences), so the derived series can't overflow
+    bound = 2 * int(np.abs(values).sum(axis=0).max()) if len(values) > 0 else 0
+    return values.astype(compact_int_dtype(bound), copy=False), columns
+
+# Subtract each goal column from its project column, reading both as views of values
+def net_array(values, columns, projects, goals):
+    net = np.empty((len(values), len(projects)), dtype=values.dtype)
+    for i, (proj, goal) in enumerate(zip(projects, goals)):
+        np.subtract(values[:, columns.index(proj)], values[:, columns.index(goal)], out=net[:, i])
+    return net
+
+# Subtract each goal column of a frame from its project column
+def net_frame(values, projects, goals):
+    net = net_array(values.to_numpy(), list(values.columns), projects, goals)
+    return pd.DataFrame(net, index=values.index, columns=projects, copy=False)
+
+# Get words written by subtracting previous day's word count from current day's word count
+# Do this for each project (column) and Total
+def words_written(df, project_columns, essential_columns, subgoal_columns, hiatus=None):
+    values, columns = words_written_array(df, project_columns, essential_columns, subgoal_columns, hiatus)
+    return pd.DataFrame(values, index=df.index, columns=columns, copy=False)
 
 # Get the words written beyond the set goal
-def net_words_written(df, project_columns, essential_columns, subgoal_columns, total_only=False):
-    diff = words_written(df, project_columns, essential_columns, subgoal_columns)
+def net_words_written(df, project_columns, essential_columns, subgoal_columns, total_only=False, hiatus=None):
+    values, columns = words_written_array(df, project_columns, essential_columns, subgoal_columns, hiatus)
     projects, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns, total_only)
-    net = diff[projects] - diff[goals].values
+    net = net_array(values, columns, projects, goals)
 
-    return net
+    return pd.DataFrame(net, index=df.index, columns=projects, copy=False)
 
 # Get cumulative words written by summing words written for each day
 # Do this for each project and Total
-def cumulative_words_written(df, project_columns, essential_columns, subgoal_columns):
-    written = words_written(df, project_columns, essential_columns, subgoal_columns)
-    cumulative = written.cumsum()
+def cumulative_words_written(df, project_columns, essential_columns, subgoal_columns, hiatus=None):
+    values, columns = words_written_array(df, project_columns, essential_columns, subgoal_columns, hiatus)
+    np.cumsum(values, axis=0, out=values)
 
-    return cumulative
+    return pd.DataFrame(values, index=df.index, columns=columns, copy=False)
 
 # Get net cumulative words written by subtracting goal from cumulative words written
-def net_cumulative_words_written(df, project_columns, essential_columns, subgoal_columns, total_only=False):
-    cumulative = cumulative_words_written(df, project_columns, essential_columns, subgoal_columns)
+def net_cumulative_words_written(df, project_columns, essential_columns, subgoal_columns, total_only=False, hiatus=None):
+    values, columns = words_written_array(df, project_columns, essential_columns, subgoal_columns, hiatus)
+    np.cumsum(values, axis=0, out=values)
     projects, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns, total_only)
-    net = cumulative[projects] - cumulative[goals].values
+    net = net_array(values, columns, projects, goals)
 
-    return net
+    return pd.DataFrame(net, index=df.index, columns=projects, copy=False)
 
 # Get the number of words written on each weekday
 def weekday_words_written(df, project_columns):
@@ -122,6 +375,97 @@ def weekday_words_written(df, project_columns):
 
     return value
 
+#####################################################################################################################################################
+##### MEMOIZED SERIES ###############################################################################################################################
+#####################################################################################################################################################
+
+# Least recently used cache of derived series, keyed by a fingerprint of the frame they came from and the column configuration
+# A frame's fingerprint is hashed from its contents the first time it is seen and kept for as long as the frame exists,
+# so if a frame is changed in place, call invalidate(df) before using it again
+# Caching across calls is opt in (pass a cache, e.g. series_cache, to the functions taking one), without one each call
+# only shares the series it derives with itself, through a scratch cache keyed on the frame's id (by_contents=False)
+class SeriesCache:
+    def __init__(self, maxsize=32, by_contents=True):
+        self.maxsize = maxsize
+        self.by_contents = by_contents
+        self.entries = OrderedDict()
+        self.fingerprints = {}          # id of each frame -> (weak reference to the frame, fingerprint)
+
+    def fingerprint(self, df):
+        if not self.by_contents:
+            return id(df)
+        known = self.fingerprints.get(id(df))
+        if not known is None and known[0]() is df:
+            return known[1]
+
+        digest = hashlib.blake2b(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes(), digest_size=16)
+        digest.update( repr( (list(df.columns), [ str(dtype) for dtype in df.dtypes ]) ).encode() )
+        fingerprint = digest.hexdigest()
+
+        # Forget the fingerprint once the frame is gone, since its id can be reused
+        key = id(df)
+        self.fingerprints[key] = (weakref.ref(df, lambda _, key=key: self.fingerprints.pop(key, None)), fingerprint)
+        return fingerprint
+
+    def get(self, key, compute):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+        value = compute()
+        self.entries[key] = value
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+        return value
+
+    # Drop everything derived from df (e.g. after changing it in place), or everything cached if df isn't given
+    def invalidate(self, df=None):
+        if df is None:
+            self.entries.clear()
+            self.fingerprints.clear()
+            return
+
+        known = self.fingerprints.pop(id(df), None)
+        if known is None:
+            return
+        for key in [ key for key in self.entries if key[0] == known[1] ]:
+            del self.entries[key]
+
+series_cache = SeriesCache()
+
+def series_key(fingerprint, name, project_columns, essential_columns, subgoal_columns, hiatus=None, total_only=False):
+    hiatus_key = None
+    if hiatus:
+        hiatus_key = tuple(sorted( (col, tuple(getattr(hiatus[col], "hiatus", hiatus[col]).intervals())) for col in hiatus ))
+    return (fingerprint, name, tuple(project_columns), tuple(sorted(essential_columns.items())), tuple(sorted(subgoal_columns.items())), hiatus_key, total_only)
+
+# Scratch cache for one call, so the series it derives are shared within the call but never outlive it
+def call_cache(cache=None):
+    return SeriesCache(by_contents=False) if cache is None else cache
+
+# Get one of the derived series of df, computing it (and whatever it is derived from) only if it isn't cached yet
+#   written -> net, written -> cumulative -> net_cumulative, written -> weekday
+# The returned frames are shared with the cache, so copy them before changing them
+def derived_series(name, df, project_columns, essential_columns, subgoal_columns, hiatus=None, total_only=False, cache=None):
+    cache = call_cache(cache)
+    columns = (project_columns, essential_columns, subgoal_columns)
+    parent = lambda parent_name, parent_total_only=False: derived_series(parent_name, df, *columns, hiatus=hiatus, total_only=parent_total_only, cache=cache)
+
+    if name == "written":
+        compute = lambda: words_written(df, *columns, hiatus)
+    elif name == "net":
+        compute = lambda: net_frame( parent("written"), *project_goal_pairs(*columns, total_only) )
+    elif name == "cumulative":
+        compute = lambda: parent("written").cumsum()
+    elif name == "net_cumulative":
+        compute = lambda: net_frame( parent("cumulative"), *project_goal_pairs(*columns, total_only) )
+    elif name == "weekday":
+        compute = lambda: weekday_words_written(parent("written"), project_columns)
+    else:
+        raise ValueError(f"Unknown series {name}")
+
+    return cache.get( series_key(cache.fingerprint(df), name, *columns, hiatus, total_only), compute )
+
 #####################################################################################################################################################
 ##### METRICS #######################################################################################################################################
 #####################################################################################################################################################
@@ -132,35 +476,104 @@ def select_weekday(df, weekday, date_format):
         weekday = weekday_to_int([weekday])[0]
     return df[ weekdays == weekday ]
 
-def all_non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, date_format, columns=None):
-    standard_metrics = OrderedDict()
-    net_metrics = OrderedDict()
-    standard_weekday_metrics = {}
-    net_weekday_metrics = {}
-    
+# The columns the metrics are reported for, and the goals matching the net columns
+def metric_columns(df, project_columns, essential_columns, subgoal_columns, net=False, columns=None):
+    projects, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns)
+    if columns is None and net:
+        columns = [ proj for proj in projects if proj in df.columns ] + ["Total"]
+    elif columns is None:
+        columns = project_columns + ["Total"]
+
+    return columns, goals
+
+# Apply one aggregation to every column, either over the whole frame or over each group in by
+def aggregate(values, how, by=None):
+    if by is None:
+        return getattr(values, how)(axis=0)
+    return getattr(values.groupby(by), how)()
+
+# Compute every non cumulative metric from words written that have already been calculated
+# goal_values are the raw goals for each row (only given for net values)
+# When by is given, the metrics are computed for every group at once and returned as a dict of group -> metrics
+def summarize_metrics(values, goal_values=None, by=None):
+    net = not goal_values is None
+    metrics = OrderedDict()
+
+    # Days with no writing at all, which are left out of the lowest word count (with some writing)
+    if not net:
+        no_writing = values == 0
+    else:
+        no_writing = values == -goal_values
+
+    metrics["Mean Words/Day"] = aggregate(values, "mean", by)
+    metrics["Median Words/Day"] = aggregate(values, "median", by)
+    metrics["Standard Deviation Words/Day"] = aggregate(values, "std", by)
+    metrics["Highest Word Count"] = aggregate(values, "max", by)
+    metrics["Lowest Word Count"] = aggregate(values, "min", by)
+    metrics["Lowest Word Count (With Some Writing)"] = aggregate(values.where(~no_writing), "min", by)
+    if not net:
+        metrics["Skipped Days"] = aggregate(no_writing, "sum", by)
+    else:
+        # For net metrics, skipped days must be measured slightly differently
+        metrics["Skipped Days"] = aggregate(values > goal_values, "sum", by)
+
+        # The following are only useful in net
+        metrics["Negative Days"] = aggregate(values < 0, "sum", by)
+        metrics["Positive Days"] = aggregate(values > 0, "sum", by)
+
+    if by is None:
+        return metrics
+
+    # Split into the metrics for each group
+    # Groups where no day was left out keep integer values for the lowest word count, as they would if computed alone
+    integer = all( pd.api.types.is_integer_dtype(dtype) for dtype in values.dtypes )
+    all_writing = integer & ~aggregate(no_writing, "any", by).any(axis=1)
+    grouped = {}
+    for group in metrics["Mean Words/Day"].index:
+        grouped[group] = OrderedDict( (key, metrics[key].loc[group].rename(None)) for key in metrics )
+        if all_writing[group]:
+            grouped[group]["Lowest Word Count (With Some Writing)"] = grouped[group]["Lowest Word Count (With Some Writing)"].astype(int)
+
+    return grouped
+
+# Label grouped metrics by weekday name (None for weekdays with no entries)
+def split_weekday_metrics(grouped):
+    return { weekday_to_string([i])[0]:grouped.get(i) for i in range(7) }
+
+def all_non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, date_format, columns=None, hiatus=None, cache=None):
+    # Compute the words written and the weekdays once, then get every metric from the same values
+    # instead of rerunning the diff for each standard/net and overall/weekday combination
+    # Days on hiatus are left out of the metrics of the columns they apply to
+    cache = call_cache(cache)
+    written = derived_series("written", df, project_columns, essential_columns, subgoal_columns, hiatus, cache=cache)
+    net = derived_series("net", df, project_columns, essential_columns, subgoal_columns, hiatus, cache=cache)
+    _, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns)
+    goal_values = df[goals].values
+    weekdays = get_weekday(df.index, date_format)
+
+    standard_columns, _ = metric_columns(df, project_columns, essential_columns, subgoal_columns, net=False, columns=columns)
+    net_columns, _ = metric_columns(df, project_columns, essential_columns, subgoal_columns, net=True, columns=columns)
+    standard = mask_hiatus(written[standard_columns], hiatus)
+    net = mask_hiatus(net[net_columns], hiatus)
+
     # Standard words written
-    standard_metrics = non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, net=False, columns=columns)
+    standard_metrics = summarize_metrics(standard)
 
     # Net words written
-    net_metrics = non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, net=True, columns=columns)
+    net_metrics = summarize_metrics(net, goal_values)
 
-    for i in range(7):
-        standard_weekday_metrics[weekday_to_string([i])[0]] = non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, net=False, columns=columns, weekday=i)
-        net_weekday_metrics[weekday_to_string([i])[0]] = non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, net=True, columns=columns, weekday=i)
+    standard_weekday_metrics = split_weekday_metrics( summarize_metrics(standard, by=weekdays) )
+    net_weekday_metrics = split_weekday_metrics( summarize_metrics(net, goal_values, by=weekdays) )
 
     return standard_metrics, net_metrics, standard_weekday_metrics, net_weekday_metrics
 
-def non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, net=False, columns=None, total_only=False, weekday=None):
-    if columns is None and net:
-        projects, goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns)
-        columns = [ proj for proj in projects if proj in df.columns ] + ["Total"]
-    elif columns is None:
-        columns = project_columns + ["Total"]
+def non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, net=False, columns=None, total_only=False, weekday=None, hiatus=None, cache=None):
+    columns, goals = metric_columns(df, project_columns, essential_columns, subgoal_columns, net=net, columns=columns)
     
     if not net:
-        values = words_written(df, project_columns, essential_columns, subgoal_columns)
+        values = derived_series("written", df, project_columns, essential_columns, subgoal_columns, hiatus, cache=cache)
     else:
-        values = net_words_written(df, project_columns, essential_columns, subgoal_columns, total_only=total_only)
+        values = derived_series("net", df, project_columns, essential_columns, subgoal_columns, hiatus, total_only=total_only, cache=cache)
     
     # If we just want to look at the values for a particular weekday, do it now (after the words/day have been calculated)
     if not weekday is None:
@@ -169,34 +582,394 @@ def non_cumulative_metrics(df, project_columns, essential_columns, subgoal_colum
         if len(values) == 0:
             return None
 
-    values = values[columns]
-        
+    # Days on hiatus don't count towards any of the metrics
+    values = mask_hiatus(values[columns], hiatus)
+
+    if not net:
+        return summarize_metrics(values)
+    return summarize_metrics(values, df[goals].values)
+
+#####################################################################################################################################################
+##### ROLLING AND STREAK METRICS ####################################################################################################################
+#####################################################################################################################################################
+
+# Window lengths (in rows, i.e. days of the log) of the rolling metrics
+rolling_windows = [7, 30, 90]
+
+# Sum of every window of rows ending at each row, for all columns at once, from the differences of one cumulative sum
+# Rows before the first full window are NaN (as with DataFrame.rolling)
+def rolling_sum(values, window):
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.full(values.shape, np.nan)
+    if window <= len(values):
+        cumulative = np.zeros((len(values) + 1,) + values.shape[1:])
+        np.cumsum(values, axis=0, out=cumulative[1:])
+        sums[window - 1:] = cumulative[window:] - cumulative[:-window]
+    return sums
+
+# Longest run of True and the run of True ending at the last row, for each column of a boolean array (days x columns)
+# The columns are laid end to end, each padded with a False on both sides, so every run's start and end come out of one diff
+def run_lengths(mask):
+    mask = np.asarray(mask, dtype=bool)
+    if mask.ndim == 1:
+        mask = mask[:, None]
+    days, columns = mask.shape
+
+    padded = np.zeros((columns, days + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask.T
+    changes = np.diff(padded, axis=1).ravel()
+    starts, ends = np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+    longest = np.zeros(columns, dtype=np.int64)
+    np.maximum.at(longest, starts // (days + 1), ends - starts)
+
+    # The current run goes back to the last False (or the first row if there isn't one)
+    if days == 0:
+        return longest, np.zeros(columns, dtype=np.int64)
+    last_false = np.where(mask.all(axis=0), -1, days - 1 - np.argmax(~mask[::-1], axis=0))
+    return longest, days - 1 - last_false
+
+# Rolling sums, means, and goal hit rates (the fraction of days in the window meeting the goal) over each window
+# Returned as an OrderedDict of name -> DataFrame, with a column for each project and Total (goal hit rates only for the columns with a goal)
+def rolling_words_written(df, project_columns, essential_columns, subgoal_columns, windows=rolling_windows, columns=None, hiatus=None, cache=None):
+    cache = call_cache(cache)
+    written = derived_series("written", df, project_columns, essential_columns, subgoal_columns, hiatus, cache=cache)
+    net = derived_series("net", df, project_columns, essential_columns, subgoal_columns, hiatus, cache=cache)
+    standard_columns, _ = metric_columns(df, project_columns, essential_columns, subgoal_columns, net=False, columns=columns)
+    net_columns, _ = metric_columns(df, project_columns, essential_columns, subgoal_columns, net=True, columns=columns)
+    values = written[standard_columns].to_numpy()
+    hits = net[net_columns].to_numpy() >= 0
+
+    series = OrderedDict()
+    for window in windows:
+        sums = rolling_sum(values, window)
+        series[f"{window}-Day Sum"] = pd.DataFrame(sums, index=df.index, columns=standard_columns)
+        series[f"{window}-Day Mean"] = pd.DataFrame(sums / window, index=df.index, columns=standard_columns)
+        series[f"{window}-Day Goal Hit Rate"] = pd.DataFrame(rolling_sum(hits, window) / window, index=df.index, columns=net_columns)
+
+    return series
+
+# Writing and skip streaks (longest and current) and the best and worst windows, as an OrderedDict of metric -> Series like summarize_metrics
+# A day with any words written (or removed) continues a writing streak, and a day with none continues a skip streak
+def rolling_metrics(df, project_columns, essential_columns, subgoal_columns, windows=rolling_windows, columns=None, hiatus=None, cache=None):
+    cache = call_cache(cache)
+    written = derived_series("written", df, project_columns, essential_columns, subgoal_columns, hiatus, cache=cache)
+    standard_columns, _ = metric_columns(df, project_columns, essential_columns, subgoal_columns, net=False, columns=columns)
+    values = written[standard_columns].to_numpy()
+    series = rolling_words_written(df, project_columns, essential_columns, subgoal_columns, windows, columns, hiatus, cache)
+
     metrics = OrderedDict()
+    wrote = values != 0
+    for name, mask in [("Writing", wrote), ("Skip", ~wrote)]:
+        longest, current = run_lengths(mask)
+        metrics[f"Longest {name} Streak"] = pd.Series(longest, index=standard_columns)
+        metrics[f"Current {name} Streak"] = pd.Series(current, index=standard_columns)
+
+    for window in windows:
+        for name in ["Sum", "Goal Hit Rate"]:
+            rolled = series[f"{window}-Day {name}"]
+            full = rolled.to_numpy()[window - 1:]
+            if len(full) == 0:
+                continue
+            dates = rolled.index[window - 1:]
+            metrics[f"Best {window}-Day {name}"] = pd.Series(full.max(axis=0), index=rolled.columns)
+            metrics[f"Best {window}-Day {name} (Ending)"] = pd.Series(dates[full.argmax(axis=0)], index=rolled.columns)
+            metrics[f"Worst {window}-Day {name}"] = pd.Series(full.min(axis=0), index=rolled.columns)
+            metrics[f"Worst {window}-Day {name} (Ending)"] = pd.Series(dates[full.argmin(axis=0)], index=rolled.columns)
+
+    return metrics
+
+#####################################################################################################################################################
+##### INCREMENTAL METRICS ###########################################################################################################################
+#####################################################################################################################################################
+
+# Running statistics for one column, updated one value at a time
+# Mean and standard deviation use Welford's method, the median is kept with two heaps
+class RunningStats:
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.highest = None
+        self.lowest = None
+        self.lowest_writing = None
+        self.skipped = 0
+        self.negative = 0
+        self.positive = 0
+        self.low_half = []              # Lower half of the values as a max heap (stored negated)
+        self.high_half = []             # Upper half of the values as a min heap
+
+    def add(self, value, no_writing=False, skipped=False):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+        self.highest = value if self.highest is None else max(self.highest, value)
+        self.lowest = value if self.lowest is None else min(self.lowest, value)
+        if not no_writing:
+            self.lowest_writing = value if self.lowest_writing is None else min(self.lowest_writing, value)
+        self.skipped += int(skipped)
+        self.negative += int(value < 0)
+        self.positive += int(value > 0)
 
-    metrics["Mean Words/Day"] = values.mean(axis=0)
-    metrics["Median Words/Day"] = values.median(axis=0)
-    metrics["Standard Deviation Words/Day"] = values.std(axis=0)
-    metrics["Highest Word Count"] = values.max(axis=0)
-    metrics["Lowest Word Count"] = values.min(axis=0)
-    metrics["Lowest Word Count (With Some Writing)"] = values[values != 0].min(axis=0)
-    metrics["Skipped Days"] = (values == 0).sum(axis=0)
+        if len(self.low_half) == 0 or value <= -self.low_half[0]:
+            heapq.heappush(self.low_half, -value)
+        else:
+            heapq.heappush(self.high_half, value)
+        # Keep the halves balanced, with the lower half holding the extra value
+        if len(self.low_half) > len(self.high_half) + 1:
+            heapq.heappush(self.high_half, -heapq.heappop(self.low_half))
+        elif len(self.high_half) > len(self.low_half):
+            heapq.heappush(self.low_half, -heapq.heappop(self.high_half))
+
+    def median(self):
+        if self.count == 0:
+            return np.nan
+        if len(self.low_half) > len(self.high_half):
+            return float(-self.low_half[0])
+        return (-self.low_half[0] + self.high_half[0]) / 2
+
+    def std(self):
+        if self.count < 2:
+            return np.nan
+        return math.sqrt(self.m2 / (self.count - 1))
+
+    def to_dict(self):
+        return dict(vars(self))
+
+    @classmethod
+    def from_dict(cls, state):
+        stats = cls()
+        stats.__dict__.update(state)
+        return stats
+
+# Metrics that are kept up to date as rows are appended to the word count file, instead of recomputing the whole history
+# Seed it once with from_history, then call append for each new row and save it so the next run can load it
+class IncrementalMetrics:
+    def __init__(self, project_columns, essential_columns, subgoal_columns, date_format=date_format):
+        self.project_columns = list(project_columns)
+        self.essential_columns = dict(essential_columns)
+        self.subgoal_columns = dict(subgoal_columns)
+        self.date_format = date_format
+        self.projects, self.goals = project_goal_pairs(self.project_columns, self.essential_columns, self.subgoal_columns)
+
+        self.previous = None                # Word counts of each project on the last row
+        self.last_date = None
+        self.cumulative = OrderedDict( (col, 0) for col in self.project_columns + self.goals + ["Total"] )
+        self.standard = self.new_stats(self.project_columns + ["Total"])
+        self.net = self.new_stats(self.projects)
+        self.standard_weekday = [ self.new_stats(self.project_columns + ["Total"]) for _ in range(7) ]
+        self.net_weekday = [ self.new_stats(self.projects) for _ in range(7) ]
+
+    @staticmethod
+    def new_stats(columns):
+        return OrderedDict( (col, RunningStats()) for col in columns )
+
+    @classmethod
+    def from_history(cls, df, project_columns, essential_columns, subgoal_columns, date_format=date_format):
+        metrics = cls(project_columns, essential_columns, subgoal_columns, date_format)
+        for date, row in zip(parse_dates(df.index, date_format), df.to_dict("records")):
+            metrics.append(date, row)
+        return metrics
+
+    # Add one row of the word count file (the cumulative word count of each project and the goals for that day)
+    # Days up to the last one added are skipped (e.g. when a daily job runs twice), returning False
+    def append(self, date, row):
+        if isinstance(date, str):
+            date = datetime.strptime(date, self.date_format)
+        if not self.last_date is None and pd.Timestamp(date) <= self.last_date:
+            return False
+        weekday = date.weekday()
+
+        counts = { proj:int(row[proj]) for proj in self.project_columns }
+        if self.previous is None:
+            # The first row is the starting point, so nothing counts as written (matching words_written)
+            written = { col:0 for col in self.project_columns + self.goals }
+        else:
+            written = { proj:counts[proj] - self.previous[proj] for proj in self.project_columns }
+            written.update( { goal:int(row[goal]) for goal in self.goals } )
+        written["Total"] = sum( written[proj] for proj in self.project_columns )
+        self.previous = counts
+        self.last_date = pd.Timestamp(date)
+
+        for col in self.cumulative:
+            self.cumulative[col] += written[col]
+
+        for col in self.standard:
+            value = written[col]
+            for stats in (self.standard[col], self.standard_weekday[weekday][col]):
+                stats.add(value, no_writing=value == 0, skipped=value == 0)
+
+        for proj, goal in zip(self.projects, self.goals):
+            value = written[proj] - written[goal]
+            goal_value = int(row[goal])
+            for stats in (self.net[proj], self.net_weekday[weekday][proj]):
+                stats.add(value, no_writing=value == -goal_value, skipped=value > goal_value)
+
+        return True
+
+    def cumulative_words_written(self):
+        return pd.Series(self.cumulative)
+
+    def net_cumulative_words_written(self):
+        return pd.Series({ proj:self.cumulative[proj] - self.cumulative[goal] for proj, goal in zip(self.projects, self.goals) })
+
+    # The same metrics as all_non_cumulative_metrics, for everything appended so far
+    def metrics(self):
+        standard_metrics = running_metrics(self.standard)
+        net_metrics = running_metrics(self.net, net=True)
+        standard_weekday_metrics = { weekday_to_string([i])[0]:running_metrics(self.standard_weekday[i]) for i in range(7) }
+        net_weekday_metrics = { weekday_to_string([i])[0]:running_metrics(self.net_weekday[i], net=True) for i in range(7) }
+
+        return standard_metrics, net_metrics, standard_weekday_metrics, net_weekday_metrics
+
+    def to_dict(self):
+        stats_to_dict = lambda stats: { col:stats[col].to_dict() for col in stats }
+        return {"project_columns":self.project_columns,
+                "essential_columns":self.essential_columns,
+                "subgoal_columns":self.subgoal_columns,
+                "date_format":self.date_format,
+                "previous":self.previous,
+                "last_date":None if self.last_date is None else self.last_date.isoformat(),
+                "cumulative":self.cumulative,
+                "standard":stats_to_dict(self.standard),
+                "net":stats_to_dict(self.net),
+                "standard_weekday":[ stats_to_dict(stats) for stats in self.standard_weekday ],
+                "net_weekday":[ stats_to_dict(stats) for stats in self.net_weekday ]}
+
+    @classmethod
+    def from_dict(cls, state):
+        metrics = cls(state["project_columns"], state["essential_columns"], state["subgoal_columns"], state["date_format"])
+        stats_from_dict = lambda stats: OrderedDict( (col, RunningStats.from_dict(stats[col])) for col in stats )
+        metrics.previous = state["previous"]
+        metrics.last_date = None if state["last_date"] is None else pd.Timestamp(state["last_date"])
+        metrics.cumulative = OrderedDict(state["cumulative"])
+        metrics.standard = stats_from_dict(state["standard"])
+        metrics.net = stats_from_dict(state["net"])
+        metrics.standard_weekday = [ stats_from_dict(stats) for stats in state["standard_weekday"] ]
+        metrics.net_weekday = [ stats_from_dict(stats) for stats in state["net_weekday"] ]
+        return metrics
+
+    def save(self, file_name):
+        # Write to a temporary file first so an interrupted save doesn't lose the previous state
+        with open(file_name + ".tmp", "w") as f:
+            json.dump(self.to_dict(), f)
+        os.replace(file_name + ".tmp", file_name)
+
+    @classmethod
+    def load(cls, file_name):
+        with open(file_name) as f:
+            return cls.from_dict(json.load(f))
+
+# Build the metrics OrderedDict from running statistics (None if nothing has been added)
+def running_metrics(stats, net=False):
+    columns = list(stats)
+    if all( stats[col].count == 0 for col in columns ):
+        return None
+    series = lambda get, dtype=None: pd.Series([ get(stats[col]) for col in columns ], index=columns, dtype=dtype)
+
+    metrics = OrderedDict()
+    metrics["Mean Words/Day"] = series(lambda s: s.mean, float)
+    metrics["Median Words/Day"] = series(lambda s: s.median(), float)
+    metrics["Standard Deviation Words/Day"] = series(lambda s: s.std(), float)
+    metrics["Highest Word Count"] = series(lambda s: s.highest)
+    metrics["Lowest Word Count"] = series(lambda s: s.lowest)
+    metrics["Lowest Word Count (With Some Writing)"] = series(lambda s: np.nan if s.lowest_writing is None else s.lowest_writing, float)
+    metrics["Skipped Days"] = series(lambda s: s.skipped)
     if net:
-        # For net metrics, the next two must be measured slightly differently
-        goal_df = pd.DataFrame(df[goals])
-        some_progress = values.mask(values == -goal_df.values, -np.inf)
-        metrics["Lowest Word Count (With Some Writing)"] = some_progress[some_progress != -np.inf].min(axis=0)
-        metrics["Skipped Days"] = (values > goal_df.values).sum(axis=0)
-        
-        # The following are only useful in net
-        metrics["Negative Days"] = (values < 0).sum(axis=0)
-        metrics["Positive Days"] = (values > 0).sum(axis=0)
+        metrics["Negative Days"] = series(lambda s: s.negative)
+        metrics["Positive Days"] = series(lambda s: s.positive)
 
     return metrics
 
+#####################################################################################################################################################
+##### RANGE QUERIES #################################################################################################################################
+#####################################################################################################################################################
+
+# pandas period frequencies for each goal frequency
+period_frequencies = {GoalFrequency.DAILY:"D", GoalFrequency.WEEKLY:"W", GoalFrequency.MONTHLY:"M", GoalFrequency.YEARLY:"Y"}
+
+# Prefix sums of the words written and goals of every column, so the words written (and net words) between any two dates
+# is a single subtraction instead of a recomputation over the whole frame
+class WordCountIndex:
+    def __init__(self, df, project_columns, essential_columns, subgoal_columns, date_format=date_format, hiatus=None):
+        values, self.columns = words_written_array(df, project_columns, essential_columns, subgoal_columns, hiatus)
+        self.date_format = date_format
+        self.dates = parse_dates(df.index, date_format)
+        self.projects, self.goals = project_goal_pairs(project_columns, essential_columns, subgoal_columns)
+        self.positions = { col:i for i, col in enumerate(self.columns) }
+
+        # prefix[i] is the sum of the first i rows, so rows start to end (exclusive) sum to prefix[end] - prefix[start]
+        self.prefix = np.zeros((len(values) + 1, len(self.columns)), dtype=np.int64)
+        np.cumsum(values, axis=0, out=self.prefix[1:])
+
+        # When there is exactly one row per day, a date's row is found from its offset to the first date
+        self.daily = len(self.dates) > 0 and self.dates.is_monotonic_increasing and self.dates.is_unique \
+                     and (self.dates == self.dates.normalize()).all() and (self.dates[-1] - self.dates[0]).days == len(self.dates) - 1
+
+    def to_timestamp(self, date):
+        if isinstance(date, str):
+            return pd.Timestamp(datetime.strptime(date, self.date_format))
+        return pd.Timestamp(date)
+
+    # The rows from start to end (inclusive) as a slice of positions
+    def row_range(self, start=None, end=None):
+        n = len(self.dates)
+        if self.daily:
+            first = self.dates[0]
+            left = 0 if start is None else min(max((self.to_timestamp(start).normalize() - first).days, 0), n)
+            right = n if end is None else min(max((self.to_timestamp(end).normalize() - first).days + 1, 0), n)
+        else:
+            left = 0 if start is None else int(np.searchsorted(self.dates.values, self.to_timestamp(start).to_datetime64(), side="left"))
+            right = n if end is None else int(np.searchsorted(self.dates.values, self.to_timestamp(end).to_datetime64(), side="right"))
+        return left, max(left, right)
+
+    # Words written (and goals) of each column from start to end (inclusive)
+    def words_written(self, start=None, end=None):
+        left, right = self.row_range(start, end)
+        return pd.Series(self.prefix[right] - self.prefix[left], index=self.columns)
+
+    # Words written beyond the goal of each project with a goal (and Total) from start to end (inclusive)
+    def net_words_written(self, start=None, end=None):
+        left, right = self.row_range(start, end)
+        totals = self.prefix[right] - self.prefix[left]
+        net = [ totals[self.positions[proj]] - totals[self.positions[goal]] for proj, goal in zip(self.projects, self.goals) ]
+        return pd.Series(net, index=self.projects)
+
+    # Words written, goals, and net words for each period (week, month, or year) rolled up from the prefix sums
+    # goals optionally maps a project column (or Total) to a writing_project.ProjectGoal that replaces the goal column for it
+    # A goal with the same frequency counts once per period, a daily goal counts once per day in the period
+    def period_progress(self, frequency=GoalFrequency.WEEKLY, goals=None):
+        periods = self.dates.to_period(period_frequencies[frequency])
+        starts = np.concatenate([ [0], np.flatnonzero(periods[1:] != periods[:-1]) + 1 ]) if len(periods) > 0 else np.array([], dtype=int)
+        bounds = np.append(starts, len(periods))
+        totals = self.prefix[bounds[1:]] - self.prefix[bounds[:-1]]
+        index = periods[starts]
+
+        project_positions = [ self.positions[proj] for proj in self.projects ]
+        goal_positions = [ self.positions[goal] for goal in self.goals ]
+        written = pd.DataFrame(totals[:, project_positions], index=index, columns=self.projects)
+        goal = pd.DataFrame(totals[:, goal_positions], index=index, columns=self.projects)
+
+        days = np.diff(bounds)
+        for proj, project_goal in (goals or {}).items():
+            if project_goal is None or not proj in goal.columns:
+                continue
+            if project_goal.frequency == GoalFrequency.DAILY:
+                goal[proj] = project_goal.amount * days
+            elif project_goal.frequency == frequency:
+                goal[proj] = project_goal.amount
+            else:
+                raise ValueError(f"Can't compare a {project_goal.frequency.name.lower()} goal for {proj} per {frequency.name.lower()} period")
+
+        return written, goal, written - goal
+
 #####################################################################################################################################################
 ##### PLOTTING FUNCTIONS ############################################################################################################################
 #####################################################################################################################################################
 
+# matplotlib and seaborn are imported inside the plotting functions so using this module for numbers alone stays fast
+
 # TODO: Plot goals and actuals differently
 #   - Goals corresponding to specific projects should be the same color but a different style
 #   - Give the option to ommit the goals from plotting
@@ -209,84 +982,56 @@ def non_cumulative_metrics(df, project_columns, essential_columns, subgoal_colum
 #   - Limit range
 #   - Select which series (projects) to plot
 
+# Each plotting function draws on ax if it is given (otherwise a new figure), and only calls plt.show() when show is True
+# so the same functions can be used to export charts without a display
+
 # Plot a bar graph of the words written on each weekday
 # Do this for each project and Total
-def plot_weekday_words_written(values):
-    values.plot(kind="bar")
-    plt.xlabel("Weekday")
-    plt.ylabel("Words Written")
-    plt.show()
+def plot_weekday_words_written(values, ax=None, show=True):
+    import matplotlib.pyplot as plt
+    ax = values.plot(kind="bar", ax=ax)
+    ax.set_xlabel("Weekday")
+    ax.set_ylabel("Words Written")
+    if show:
+        plt.show()
+    return ax
 
 # Plot a line graph of the words written
 # This works for absolute, net, cumulative, and net cumulative
-def plot_progress(values, columns=None, omit_goals=False, project_columns=None, subgoal_columns=None, essential_columns=None):
+def plot_progress(values, columns=None, omit_goals=False, project_columns=None, subgoal_columns=None, essential_columns=None, ax=None, show=True):
+    import matplotlib.pyplot as plt
     if ( omit_goals ) and ( columns is None ) and ( not subgoal_columns is None ) and ( not essential_columns is None ):
         goal_labels = [ v for k, v in subgoal_columns.items() ]
         columns = [ col for col in values.columns if not col in goal_labels and not col == essential_columns["Goal"] ]
-    values.plot(kind="line", y=columns)
-    plt.hlines(0, -1, len(values.index)+1, linestyles=":", color="black")
-    plt.xlim([0, len(values.index)])
-    plt.xlabel("Date")
-    plt.xticks(rotation=45)
-    plt.ylabel("Words Written")
-    plt.show()
-
-def histogram_words_written(df, project_columns, bins=10, columns=None):
+    ax = values.plot(kind="line", y=columns, ax=ax)
+    ax.hlines(0, values.index[0], values.index[-1], linestyles=":", color="black")
+    ax.set_xlim([values.index[0], values.index[-1]])
+    ax.set_xlabel("Date")
+    ax.tick_params(axis="x", labelrotation=45)
+    ax.set_ylabel("Words Written")
+    if show:
+        plt.show()
+    return ax
+
+def histogram_words_written(df, project_columns, bins=10, columns=None, ax=None, show=True):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     if columns is None:
         columns = project_columns + ["Total"]
         columns = [ col for col in columns if col in df.columns ]
     #df.plot(kind="hist", bins=bins, y=columns, alpha=0.5)
-    print(df[columns].melt())
-    sns.histplot(data=df[columns].melt(), multiple="dodge", x="value", shrink=0.75, bins=bins, hue="variable")
-    plt.xlabel("Words Written")
-    plt.ylabel("Frequency")
-    plt.show()
+    ax = sns.histplot(data=df[columns].melt(), multiple="dodge", x="value", shrink=0.75, bins=bins, hue="variable", ax=ax)
+    ax.set_xlabel("Words Written")
+    ax.set_ylabel("Frequency")
+    if show:
+        plt.show()
+    return ax
 
 #####################################################################################################################################################
-##### MAIN ##########################################################################################################################################
+##### INSTRUMENTATION ###############################################################################################################################
 #####################################################################################################################################################
 
-# TODO: Add metrics and plots
-#   - Histogram of words written (allow variable bins sizes/numbers)
-#   - Cumulative metrics
-#   - For cumulative metrics, fit an equation?
-
-df = read_word_count_file(word_count_file)
-standard = words_written(df, project_columns, essential_columns, subgoal_columns)
-net_words = net_words_written(df, project_columns, essential_columns, subgoal_columns)
-
-#print(weekday_words_written( net_words_written(df) ))
-#plot_weekday_words_written( weekday_words_written( words_written(df) ) )
-
-print(">>>>> Standard")
-print(words_written(df, project_columns, essential_columns, subgoal_columns)[:5] )
-print(">>>>> Net")
-print(net_words_written(df, project_columns, essential_columns, subgoal_columns)[:5] )
-#print(">>>>> Cumulative")
-#print(cumulative_words_written(df, project_columns, essential_columns, subgoal_columns)[:5] )
-#print(">>>>> Net Cumulative")
-#print(net_cumulative_words_written(df, project_columns, essential_columns, subgoal_columns)[:5] )
-
-#histogram_words_written(net_words, project_columns, bins=10)
-
-print(">>>>> Metrics")
-standard_metrics, net_metrics, standard_week_metrics, net_week_metrics = all_non_cumulative_metrics(df[1:25], project_columns, essential_columns, subgoal_columns, date_format, columns=None)
-print(">>>>> Standard")
-for key in standard_metrics:
-    print(f">>> {key}:\n{standard_metrics[key]}")
-print(">>>>> Net")
-for key in net_metrics:
-    print(f">>> {key}:\n{net_metrics[key]}")
-print(">>>>> Standard Week")
-print(standard_week_metrics.keys())
-for day in standard_week_metrics:
-    print(f">>>{day}")
-    for key in standard_week_metrics[day]:
-        print(f">>>>> {key}:\n{standard_week_metrics[day][key]}")
-print(">>>>> Net Week")
-for day in net_week_metrics:
-    print(f">>>{day}")
-    for key in net_week_metrics[day]:
-        print(f">>>>> {key}:\n{net_week_metrics[day][key]}")
-
-#plot_progress( cumulative_words_written(df, project_columns, essential_columns, subgoal_columns), subgoal_columns=subgoal_columns, essential_columns=essential_columns, omit_goals=True )
\ No newline at end of file
+# Stage timing can be switched on without changing any code by setting WRITING_METRICS_INSTRUMENT (see instrumentation.py)
+if os.environ.get("WRITING_METRICS_INSTRUMENT"):
+    import instrumentation
+    instrumentation.enable_from_environment(sys.modules[__name__])
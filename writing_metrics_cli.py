@@ -0,0 +1,166 @@
+import argparse
+import writing_metrics as wm
+
+# Command line entry point for writing_metrics
+# e.g. python -m writing_metrics_cli test.csv --projects "Test Book 1" "Test Book 2" --subgoal "Test Book 1=Test Book 1 Goal" --reports standard net metrics
+
+# TODO: Add metrics and plots
+#   - Histogram of words written (allow variable bins sizes/numbers)
+#   - Cumulative metrics
+#   - For cumulative metrics, fit an equation?
+
+TABLE_REPORTS = ["standard", "net", "cumulative", "net-cumulative", "weekday"]
+METRIC_REPORTS = ["metrics", "rolling"]
+PLOT_REPORTS = ["plot-weekday", "plot-progress", "histogram"]
+REPORTS = TABLE_REPORTS + METRIC_REPORTS + PLOT_REPORTS
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m writing_metrics_cli", description="Report words written and writing metrics from a word count file")
+    parser.add_argument("word_count_file", nargs="?", default=wm.word_count_file, help="CSV or XLSX word count file")
+    parser.add_argument("--projects", nargs="+", default=wm.project_columns, help="Project columns in the word count file")
+    parser.add_argument("--subgoal", action="append", default=None, metavar="PROJECT=GOAL",
+                        help="Subgoal column for a project (can be given more than once)")
+    parser.add_argument("--date-column", default=wm.essential_columns["Date"], help="Name of the date column")
+    parser.add_argument("--goal-column", default=wm.essential_columns["Goal"], help="Name of the overall goal column")
+    parser.add_argument("--date-format", default=wm.date_format, help="Format of the dates in the word count file")
+    parser.add_argument("--reports", nargs="+", default=["standard", "net", "metrics"], choices=REPORTS, help="Reports to run, in order")
+    parser.add_argument("--rows", type=int, default=5, help="Number of rows to print for table reports (0 for all)")
+    parser.add_argument("--bins", type=int, default=10, help="Number of bins for the histogram")
+    parser.add_argument("--no-cache", action="store_true", help="Always read the word count file instead of its cache")
+    parser.add_argument("--watch", action="store_true", help="Keep running, and update the reports whenever the word count file changes")
+    parser.add_argument("--instrument", nargs="?", const="text", default=None, choices=["text", "json"],
+                        help="Report the time spent in each stage (to stderr, or to --instrument-report)")
+    parser.add_argument("--instrument-report", default=None, help="File to write the instrumentation report to")
+    parser.add_argument("--trace-memory", action="store_true", help="Also record the memory allocated in each stage (slower)")
+    parser.add_argument("--profile", action="store_true", help="Also run cProfile and add its top functions to the report")
+    parser.add_argument("--interval", type=float, default=1.0, help="Seconds between checks when watching without inotify")
+
+    return parser.parse_args(argv)
+
+def parse_subgoals(subgoals):
+    if subgoals is None:
+        return dict(wm.subgoal_columns)
+
+    subgoal_columns = {}
+    for subgoal in subgoals:
+        project, sep, goal = subgoal.partition("=")
+        if not sep:
+            raise ValueError(f"Subgoal must be given as PROJECT=GOAL, got {subgoal}")
+        subgoal_columns[project] = goal
+    return subgoal_columns
+
+def print_metrics(metrics):
+    for key in metrics:
+        print(f">>> {key}:\n{metrics[key]}")
+
+def print_weekday_metrics(weekday_metrics):
+    for day in weekday_metrics:
+        print(f">>>{day}")
+        if weekday_metrics[day] is None:
+            continue
+        for key in weekday_metrics[day]:
+            print(f">>>>> {key}:\n{weekday_metrics[day][key]}")
+
+def run_report(report, df, project_columns, essential_columns, subgoal_columns, date_format, rows=5, bins=10):
+    # The frame isn't changed while the reports run, so the series are shared between them through the memoized cache
+    series = lambda name: wm.derived_series(name, df, project_columns, essential_columns, subgoal_columns, cache=wm.series_cache)
+    if report == "standard":
+        values = series("written")
+    elif report == "net":
+        values = series("net")
+    elif report == "cumulative":
+        values = series("cumulative")
+    elif report == "net-cumulative":
+        values = series("net_cumulative")
+    elif report == "weekday":
+        values = series("weekday")
+    elif report == "metrics":
+        standard_metrics, net_metrics, standard_week_metrics, net_week_metrics = wm.all_non_cumulative_metrics(df, project_columns, essential_columns, subgoal_columns, date_format, cache=wm.series_cache)
+        print(">>>>> Standard")
+        print_metrics(standard_metrics)
+        print(">>>>> Net")
+        print_metrics(net_metrics)
+        print(">>>>> Standard Week")
+        print_weekday_metrics(standard_week_metrics)
+        print(">>>>> Net Week")
+        print_weekday_metrics(net_week_metrics)
+        return
+    elif report == "rolling":
+        print_metrics( wm.rolling_metrics(df, project_columns, essential_columns, subgoal_columns, cache=wm.series_cache) )
+        return
+    elif report == "plot-weekday":
+        wm.plot_weekday_words_written( series("weekday") )
+        return
+    elif report == "plot-progress":
+        wm.plot_progress( series("cumulative"), subgoal_columns=subgoal_columns, essential_columns=essential_columns, omit_goals=True )
+        return
+    elif report == "histogram":
+        wm.histogram_words_written( series("net"), project_columns, bins=bins )
+        return
+    else:
+        raise ValueError(f"Unknown report {report}")
+
+    print(values if rows <= 0 else values[:rows])
+
+def main(argv=None):
+    args = parse_args(argv)
+    project_columns = list(args.projects)
+    essential_columns = {"Date":args.date_column, "Goal":args.goal_column}
+    subgoal_columns = parse_subgoals(args.subgoal)
+
+    instrumented = not args.instrument is None or not args.instrument_report is None
+    if instrumented:
+        import instrumentation
+        instrumentation.enable(memory=args.trace_memory, profile=args.profile)
+    try:
+        run(args, project_columns, essential_columns, subgoal_columns)
+    finally:
+        if instrumented:
+            instrumentation.disable()
+            instrumentation.write_report(args.instrument_report, args.instrument == "json")
+
+def run(args, project_columns, essential_columns, subgoal_columns):
+    try:
+        df = wm.read_word_count_file(args.word_count_file, date_format=args.date_format, use_cache=not args.no_cache)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    run_reports(args.reports, df, project_columns, essential_columns, subgoal_columns, args.date_format, args.rows, args.bins)
+
+    if args.watch:
+        watch(args, project_columns, essential_columns, subgoal_columns)
+
+def run_reports(reports, df, project_columns, essential_columns, subgoal_columns, date_format, rows=5, bins=10):
+    for report in reports:
+        print(f">>>>> {report.replace('-', ' ').title()}")
+        run_report(report, df, project_columns, essential_columns, subgoal_columns, date_format, rows=rows, bins=bins)
+
+# Print the new rows as they are appended (with the updated metrics), or every report again if earlier rows changed
+# Plots are only drawn once, before watching starts
+def watch(args, project_columns, essential_columns, subgoal_columns):
+    from watcher import WordCountWatcher
+    watcher = WordCountWatcher(args.word_count_file, project_columns, essential_columns, subgoal_columns, args.date_format)
+    reports = [ report for report in args.reports if not report in PLOT_REPORTS ]
+
+    def on_update(update):
+        if update["reloaded"]:
+            print(">>>>> Reloaded")
+            run_reports(reports, watcher.df, project_columns, essential_columns, subgoal_columns, args.date_format, args.rows, args.bins)
+            return
+        print(">>>>> New Rows")
+        print(update["written"])
+        if "metrics" in reports:
+            standard_metrics, net_metrics, _, _ = watcher.metrics.metrics()
+            print(">>>>> Standard")
+            print_metrics(standard_metrics)
+            print(">>>>> Net")
+            print_metrics(net_metrics)
+
+    print(f">>>>> Watching {args.word_count_file} (Ctrl+C to stop)")
+    try:
+        watcher.watch(on_update, interval=args.interval)
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
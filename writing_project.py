@@ -1,5 +1,6 @@
 from enum import Enum
-from datetime import datetime, timedelta
+import bisect
+import numpy as np
 
 class GoalFrequency(Enum):
     DAILY = 1
@@ -8,23 +9,86 @@ class GoalFrequency(Enum):
     YEARLY = 4
 
 class Project:
+    __slots__ = ("name", "goal", "start", "end", "hiatus")
+
     def __init__(self, name, goal=None, start=None, end=None):
         self.name = name
         self.goal = goal
         self.start=start
         self.end=end
-        self.hiatus = set()            # Set of dates to ignore (Long spans of no activity with an explanation)
+        self.hiatus = Hiatus()         # Dates to ignore (Long spans of no activity with an explanation)
 
     def set_goal(self, amount, frequency=GoalFrequency.DAILY):
         self.goal = ProjectGoal(amount, frequency)
 
     def set_hiatus(self, start, end):
-        delta = end - start
-        
-        for i in range(delta.days + 1):
-            self.hiatus.add(start + timedelta(days=i))
+        self.hiatus.add(start, end)
 
 class ProjectGoal:
+    __slots__ = ("amount", "frequency")
+
     def __init__(self, amount, frequency=GoalFrequency.DAILY):
         self.amount = amount
-        self.frequency = frequency
\ No newline at end of file
+        self.frequency = frequency
+
+# Spans of dates (inclusive) stored as sorted, merged intervals rather than every individual date
+class Hiatus:
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals=None):
+        self.starts = []
+        self.ends = []
+        for start, end in intervals or []:
+            self.add(start, end)
+
+    @staticmethod
+    def to_day(date):
+        return np.datetime64(date, "D")
+
+    def add(self, start, end):
+        start, end = self.to_day(start), self.to_day(end)
+        if end < start:
+            raise ValueError(f"Hiatus ends ({end}) before it starts ({start})")
+
+        # Merge with every interval that overlaps or touches this one
+        one_day = np.timedelta64(1, "D")
+        first = bisect.bisect_left(self.ends, start - one_day)
+        last = bisect.bisect_right(self.starts, end + one_day)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def __contains__(self, date):
+        day = self.to_day(date)
+        i = bisect.bisect_right(self.starts, day) - 1
+        return i >= 0 and day <= self.ends[i]
+
+    # Whether any day from start to end (inclusive) is on hiatus
+    def overlaps(self, start, end):
+        i = bisect.bisect_right(self.starts, self.to_day(end)) - 1
+        return i >= 0 and self.to_day(start) <= self.ends[i]
+
+    # Whether every day from start to end (inclusive) is on hiatus
+    def covers(self, start, end):
+        i = bisect.bisect_right(self.starts, self.to_day(start)) - 1
+        return i >= 0 and self.to_day(end) <= self.ends[i]
+
+    # Boolean array of which dates are on hiatus
+    def mask(self, dates):
+        days = np.asarray(dates, dtype="datetime64[D]")
+        if len(self.starts) == 0:
+            return np.zeros(days.shape, dtype=bool)
+        i = np.searchsorted(np.array(self.starts), days, side="right") - 1
+        return (i >= 0) & ( days <= np.array(self.ends)[np.maximum(i, 0)] )
+
+    def intervals(self):
+        return [ (start.item(), end.item()) for start, end in zip(self.starts, self.ends) ]
+
+    # Number of days on hiatus (as the set of dates used to hold)
+    def __len__(self):
+        return sum( int((end - start) / np.timedelta64(1, "D")) + 1 for start, end in zip(self.starts, self.ends) )
+
+    def __repr__(self):
+        return f"Hiatus({self.intervals()})"